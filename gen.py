@@ -1,58 +1,333 @@
 import requests
-from typing import Optional
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import aiohttp
+from typing import Dict, List, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+import threading
+import asyncio
+import socket
 import urllib.parse
+import email.utils
 import tempfile
+import hashlib
+import time
 import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = "https://image.pollinations.ai/prompt/"
+
+# Generation is deterministic for a given URL (prompt+size+seed), so cache
+# downloads on disk and serve repeats without another diffusion round-trip.
+# The cache owns the files' lifetime: callers must not delete returned paths
+CACHE_DIR = os.path.join(tempfile.gettempdir(), 'bella_image_cache')
+CACHE_TTL = 24 * 3600  # seconds before a cached result is considered stale
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+def _cache_path_for(url: str) -> str:
+    key = hashlib.blake2b(url.encode(), digest_size=16).hexdigest()
+    return os.path.join(CACHE_DIR, key + '.png')
+
+def _get_cached(url: str) -> Optional[str]:
+    """Return the cached path for this URL if present and fresh"""
+    path = _cache_path_for(url)
+    try:
+        if time.time() - os.path.getmtime(path) < CACHE_TTL:
+            return path
+    except OSError:
+        pass
+    return None
+
+def _prune_cache():
+    """Evict least-recently-used cache entries until under the size budget"""
+    try:
+        entries = []
+        total = 0
+        with os.scandir(CACHE_DIR) as it:
+            for entry in it:
+                if not entry.name.endswith('.png'):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_atime, stat.st_size, entry.path))
+                total += stat.st_size
+
+        if total <= CACHE_MAX_BYTES:
+            return
+
+        entries.sort()  # oldest access time first
+        for _, size, path in entries:
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= CACHE_MAX_BYTES:
+                break
+    except OSError:
+        pass
+
+# Singleflight maps: concurrent requests for the same URL share one download
+# instead of hitting Pollinations twice (one map for threads, one for the
+# event loop)
+_inflight_lock = threading.Lock()
+_inflight: Dict[str, Future] = {}
+_async_inflight: Dict[str, "asyncio.Task"] = {}
+
+# Sentinel returned by download_image_to_file when the server answers 304
+NOT_MODIFIED = object()
+
+# DNS results for the Pollinations host are stable; memoize getaddrinfo for
+# a short TTL so reconnects after keep-alive drops skip the resolver round-trip.
+# Only that host is cached - everything else (discord gateway, Gemini, ...)
+# goes straight to the real resolver so the patch can't serve them stale
+# answers
+_DNS_TTL = 300
+_CACHED_DNS_HOSTS = frozenset({urllib.parse.urlsplit(BASE_URL).hostname})
+_dns_lock = threading.Lock()
+_dns_cache: Dict[tuple, tuple] = {}
+_real_getaddrinfo = None
+
+def _cached_getaddrinfo(host, port, *args, **kwargs):
+    if host not in _CACHED_DNS_HOSTS:
+        return _real_getaddrinfo(host, port, *args, **kwargs)
+
+    key = (host, port, args, tuple(sorted(kwargs.items())))
+    now = time.monotonic()
+    with _dns_lock:
+        hit = _dns_cache.get(key)
+        if hit is not None and now - hit[0] < _DNS_TTL:
+            return hit[1]
+
+    result = _real_getaddrinfo(host, port, *args, **kwargs)
+    with _dns_lock:
+        _dns_cache[key] = (now, result)
+    return result
+
+def _install_dns_cache():
+    """Swap in the caching resolver once; failed lookups are never cached"""
+    global _real_getaddrinfo
+    with _dns_lock:
+        if _real_getaddrinfo is None:
+            _real_getaddrinfo = socket.getaddrinfo
+            socket.getaddrinfo = _cached_getaddrinfo
+
+def _conditional_headers(cache_path: str) -> Optional[dict]:
+    """If-Modified-Since headers for an existing (stale) cache entry"""
+    try:
+        mtime = os.path.getmtime(cache_path)
+    except OSError:
+        return None
+    return {'If-Modified-Since': email.utils.formatdate(mtime, usegmt=True)}
+
+def _download_to_cache(url: str, downloader: Optional["ImageDownloader"] = None) -> Optional[str]:
+    """Download url into the cache atomically; returns the cache path or None"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    cache_path = _cache_path_for(url)
+
+    # A stale cache entry can still be revalidated for free: a 304 from the
+    # CDN means we keep the bytes we already have
+    headers = _conditional_headers(cache_path)
+
+    # mkstemp hands back a unique name and an already-open fd in one
+    # syscall, so concurrent downloads never collide and the file isn't
+    # reopened for writing
+    fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=CACHE_DIR)
+    fd_owned = False  # os.fdopen takes ownership of fd once it runs
+    try:
+        owns_downloader = downloader is None
+        if owns_downloader:
+            downloader = ImageDownloader()
+        try:
+            fd_owned = True
+            with os.fdopen(fd, 'wb') as file:
+                result = downloader.download_image_to_file(url, file,
+                                                           headers=headers)
+        finally:
+            if owns_downloader:
+                downloader.close()
+
+        if result is NOT_MODIFIED:
+            os.unlink(temp_path)
+            os.utime(cache_path)  # refresh the TTL clock
+            return cache_path
+        if not result:
+            os.unlink(temp_path)
+            return None
+
+        # Publish atomically so partial downloads are never observable
+        os.replace(temp_path, cache_path)
+        return cache_path
+
+    except Exception:
+        if not fd_owned:
+            os.close(fd)
+        if os.path.exists(temp_path):
+            os.unlink(temp_path)
+        raise
+
+def _coalesced_download(url: str, downloader: Optional["ImageDownloader"] = None) -> Optional[str]:
+    """Thread-side singleflight wrapper around _download_to_cache"""
+    with _inflight_lock:
+        future = _inflight.get(url)
+        is_leader = future is None
+        if is_leader:
+            future = Future()
+            _inflight[url] = future
+
+    if not is_leader:
+        return future.result()
+
+    try:
+        result = _download_to_cache(url, downloader)
+        future.set_result(result)
+        return result
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(url, None)
+
+def build_pollinations_url(prompt: str, width: int = 512, height: int = 512,
+                           seed: Optional[int] = None,
+                           model: str = 'stable-diffusion') -> str:
+    """
+    Build a Pollinations.ai URL with the given parameters
+    """
+    # URL encode the prompt so spaces and special chars survive the trip;
+    # width/height/seed are ints and model is a fixed token, so the query
+    # string can be formatted directly without building a params dict
+    encoded_prompt = urllib.parse.quote(prompt, safe='')
+    seed_part = f'&seed={seed}' if seed is not None else ''
+    return (f"{BASE_URL}{encoded_prompt}"
+            f"?width={width}&height={height}&model={model}{seed_part}")
+
+# Disable Nagle so request headers go out immediately, and turn on TCP
+# keepalive probes so the pool's idle connections stay warm between bot calls
+_SOCKET_OPTIONS = [
+    (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+    (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+]
+if hasattr(socket, 'TCP_KEEPIDLE'):  # Linux-only tunables
+    _SOCKET_OPTIONS += [
+        (socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, 60),
+        (socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 30),
+    ]
+
+class KeepAliveAdapter(HTTPAdapter):
+    """HTTPAdapter that applies our TCP socket options to pooled connections"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        kwargs['socket_options'] = _SOCKET_OPTIONS
+        super().init_poolmanager(*args, **kwargs)
 
 class ImageDownloader:
     def __init__(self):
-        self.base_url = "https://image.pollinations.ai/prompt/"
+        self.base_url = BASE_URL
+        _install_dns_cache()
+
+        # Reuse one session so the TCP/TLS connection is kept alive between
+        # downloads instead of paying a fresh handshake per request
+        self.session = requests.Session()
+        retries = Retry(total=3, backoff_factor=0.3,
+                        status_forcelist=[502, 503, 504])
+        self.session.mount(
+            "https://",
+            KeepAliveAdapter(pool_connections=4, pool_maxsize=20,
+                             max_retries=retries))
+        # Advertise compression and keep-alive up front; the streaming path
+        # sets decode_content so compressed bodies are inflated in-line
+        # (brotli is left out since we don't ship a decoder for it)
+        self.session.headers.update({
+            'User-Agent': 'bella-bot/1.0',
+            'Accept': 'image/png,image/jpeg,*/*',
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive',
+        })
+
+    def close(self):
+        """Close the underlying session and its pooled connections"""
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def download_image_to_file(self, image_url: str, file, headers=None):
+        """
+        Download image from a given URL into an open binary file object
+
+        Args:
+            image_url (str): URL of the image to download
+            file: Writable binary file object to stream the image into
+            headers: Optional extra request headers (e.g. If-Modified-Since)
+
+        Returns:
+            True if download successful, NOT_MODIFIED if the server answered
+            304 to a conditional request, False otherwise
+        """
+        try:
+            # Stream the body straight to disk in 64 KiB chunks instead of
+            # buffering the whole image in memory first
+            with self.session.get(image_url, timeout=30, stream=True,
+                                  headers=headers) as response:
+                if response.status_code == 304:
+                    return NOT_MODIFIED
+                response.raise_for_status()
+                response.raw.decode_content = True
+
+                # readinto reuses one preallocated buffer across chunks,
+                # avoiding a fresh bytes allocation per 64 KiB of image
+                buffer = bytearray(65536)
+                view = memoryview(buffer)
+                readinto = response.raw.readinto
+                write = file.write
+                while True:
+                    n = readinto(buffer)
+                    if not n:
+                        break
+                    write(view[:n])
+            return True
+
+        except requests.RequestException as e:
+            logger.error('Error downloading image: %s', e)
+            return False
+        except IOError as e:
+            logger.error('Error saving image: %s', e)
+            return False
 
     def download_image_from_url(self, image_url: str, output_filename: str) -> bool:
         """
         Download image from a given URL and save it to a file
-        
+
         Args:
             image_url (str): URL of the image to download
             output_filename (str): Name of the file to save the image
-            
+
         Returns:
             bool: True if download successful, False otherwise
         """
         try:
-            response = requests.get(image_url, timeout=30)  # Added timeout
-            response.raise_for_status()
-            
             with open(output_filename, 'wb') as file:
-                file.write(response.content)
-            print(f'Download completed: {output_filename}')
+                if not self.download_image_to_file(image_url, file):
+                    return False
+            logger.debug('Download completed: %s', output_filename)
             return True
-            
-        except requests.RequestException as e:
-            print(f'Error downloading image: {e}')
-            return False
+
         except IOError as e:
-            print(f'Error saving image: {e}')
+            logger.error('Error saving image: %s', e)
             return False
 
-    def generate_pollinations_url(self, prompt: str, width: int = 512, height: int = 512, 
+    def generate_pollinations_url(self, prompt: str, width: int = 512, height: int = 512,
                                 seed: Optional[int] = None, model: str = 'stable-diffusion') -> str:
         """
         Generate a Pollinations.ai URL with the given parameters
         """
-        # URL encode the prompt
-        encoded_prompt = urllib.parse.quote(prompt)
-        params = {
-            'width': width,
-            'height': height,
-            'model': model
-        }
-        if seed is not None:
-            params['seed'] = seed
-            
-        url = f"{self.base_url}{prompt}"
-        params_str = '&'.join(f"{k}={v}" for k, v in params.items())
-        return f"{url}?{params_str}"
+        return build_pollinations_url(prompt, width, height, seed, model)
 
     def generate_with_pollinations(self, prompt: str, width: int, height: int,
                                  seed: Optional[int] = None, 
@@ -75,7 +350,7 @@ class ImageDownloader:
             return None
             
         except Exception as e:
-            print(f'Error generating image: {e}')
+            logger.error('Error generating image: %s', e)
             return None
 
 def generate_image(prompt: str, width: int = 1024, height: int = 1024, seed: Optional[int] = None) -> Optional[str]:
@@ -92,33 +367,162 @@ def generate_image(prompt: str, width: int = 1024, height: int = 1024, seed: Opt
         Optional[str]: Path to the generated image file, or None if generation failed
     """
     try:
-        # Create ImageDownloader instance
-        downloader = ImageDownloader()
-        
-        # Create a temporary file with .png extension
-        temp_file = tempfile.NamedTemporaryFile(suffix='.png', delete=False)
-        temp_path = temp_file.name
-        temp_file.close()
-        
-        # Generate the image using Pollinations
-        generated_url = downloader.generate_with_pollinations(
-            prompt=prompt,
-            width=width,
-            height=height,
-            seed=seed,
-            output_filename=temp_path
-        )
-        
-        if generated_url and os.path.exists(temp_path):
-            return temp_path
-        return None
-        
+        url = build_pollinations_url(prompt, width, height, seed)
+
+        # Serve identical requests from the disk cache
+        cached = _get_cached(url)
+        if cached:
+            return cached
+
+        cache_path = _coalesced_download(url)
+        if cache_path:
+            _prune_cache()
+        return cache_path
+
     except Exception as e:
-        print(f"Error in generate_image: {str(e)}")
-        if 'temp_path' in locals() and os.path.exists(temp_path):
+        logger.error('Error in generate_image: %s', e)
+        return None
+
+# Shared aiohttp session for the bot's event loop, created lazily so
+# importing this module never requires a running loop
+_async_session: Optional[aiohttp.ClientSession] = None
+
+async def _get_async_session() -> aiohttp.ClientSession:
+    global _async_session
+    if _async_session is None or _async_session.closed:
+        _install_dns_cache()
+        _async_session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=30),
+            headers={'User-Agent': 'bella-bot/1.0',
+                     'Accept': 'image/png,image/jpeg,*/*'},
+            connector=aiohttp.TCPConnector(limit=50, limit_per_host=20,
+                                           keepalive_timeout=75))
+    return _async_session
+
+async def _download_to_cache_async(url: str) -> Optional[str]:
+    """Async counterpart of _download_to_cache using the shared session"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    cache_path = _cache_path_for(url)
+    headers = _conditional_headers(cache_path)
+    fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=CACHE_DIR)
+    fd_owned = False  # os.fdopen takes ownership of fd once it runs
+    try:
+        session = await _get_async_session()
+        async with session.get(url, headers=headers) as response:
+            if response.status == 304:
+                os.close(fd)
+                fd_owned = True
+                os.unlink(temp_path)
+                os.utime(cache_path)  # refresh the TTL clock
+                return cache_path
+            response.raise_for_status()
+            fd_owned = True
+            with os.fdopen(fd, 'wb') as file:
+                async for chunk in response.content.iter_chunked(65536):
+                    file.write(chunk)
+
+        # Publish atomically so partial downloads are never observable
+        os.replace(temp_path, cache_path)
+        return cache_path
+
+    except Exception:
+        # A failure before fdopen ran (connect error, timeout, 4xx/5xx)
+        # would otherwise leak the descriptor on every bad download
+        if not fd_owned:
+            os.close(fd)
+        if os.path.exists(temp_path):
             os.unlink(temp_path)
+        raise
+
+def _coalesced_download_async(url: str) -> "asyncio.Task":
+    """Event-loop-side singleflight: concurrent callers await the same task"""
+    task = _async_inflight.get(url)
+    if task is None:
+        task = asyncio.ensure_future(_download_to_cache_async(url))
+        _async_inflight[url] = task
+        task.add_done_callback(lambda _: _async_inflight.pop(url, None))
+    return task
+
+async def generate_image_async(prompt: str, width: int = 1024, height: int = 1024,
+                               seed: Optional[int] = None) -> Optional[str]:
+    """
+    Async variant of generate_image for use inside the bot's event loop
+
+    Downloads through a shared aiohttp session, so many concurrent
+    generations multiplex over pooled keep-alive connections without
+    blocking the event loop or spawning a thread per request.
+
+    Args:
+        prompt (str): Description of the image to generate
+        width (int): Image width (default: 1024)
+        height (int): Image height (default: 1024)
+        seed (Optional[int]): Random seed for consistent generation (default: None)
+
+    Returns:
+        Optional[str]: Path to the generated image file, or None if generation failed
+    """
+    try:
+        url = build_pollinations_url(prompt, width, height, seed)
+
+        # Serve identical requests from the disk cache
+        cached = _get_cached(url)
+        if cached:
+            return cached
+
+        cache_path = await _coalesced_download_async(url)
+        if cache_path:
+            _prune_cache()
+        return cache_path
+
+    except Exception as e:
+        logger.error('Error in generate_image_async: %s', e)
         return None
 
+def generate_images_batch(prompts: List[str], width: int = 1024, height: int = 1024,
+                          seed: Optional[int] = None,
+                          max_workers: int = 4) -> List[Optional[str]]:
+    """
+    Generate several images concurrently through one shared session
+
+    Each prompt is latency-bound on the Pollinations server, so dispatching
+    them through a thread pool overlaps the round-trips instead of paying
+    them one after another.
+
+    Args:
+        prompts (List[str]): Descriptions of the images to generate
+        width (int): Image width (default: 1024)
+        height (int): Image height (default: 1024)
+        seed (Optional[int]): Random seed for consistent generation (default: None)
+        max_workers (int): Maximum concurrent downloads (default: 4)
+
+    Returns:
+        List[Optional[str]]: Paths to the generated images, in prompt order,
+        with None for any prompt that failed
+    """
+    def _generate_one(downloader: ImageDownloader, prompt: str) -> Optional[str]:
+        try:
+            url = build_pollinations_url(prompt, width, height, seed)
+
+            cached = _get_cached(url)
+            if cached:
+                return cached
+
+            return _coalesced_download(url, downloader)
+        except Exception as e:
+            logger.error('Error in generate_images_batch: %s', e)
+            return None
+
+    with ImageDownloader() as downloader:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(_generate_one, downloader, prompt)
+                for prompt in prompts
+            ]
+            results = [future.result() for future in futures]
+
+    _prune_cache()
+    return results
+
 def main():
     # Example usage
     downloader = ImageDownloader()
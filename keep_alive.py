@@ -1,36 +1,89 @@
-from flask import Flask, make_response
-from threading import Thread
+import asyncio
 import logging
-from waitress import serve
-from functools import wraps
+from threading import Thread
 
-app = Flask('')
 logging.basicConfig(level=logging.INFO)
 
-def cache_response(timeout=5 * 60):  # 5 minute cache
-    def decorator(f):
-        @wraps(f)
-        def wrapper(*args, **kwargs):
-            response = make_response(f(*args, **kwargs))
-            response.cache_control.max_age = timeout
-            response.cache_control.public = True
-            return response
-        return wrapper
-    return decorator
-
-@app.route('/')
-@cache_response(timeout=5 * 60)
-def home():
-    return "I'm alive and running! 🤖"
-
-@app.route('/health')
-@cache_response(timeout=60)  # 1 minute cache for health checks
-def health():
-    return "OK", 200
+_HEALTH_ETAG = b'"ok-v1"'
+
+# The endpoints only ever return fixed bodies, so the full HTTP responses are
+# prebuilt byte blobs — no framework, no parsing beyond the request line, and
+# zero allocations per ping
+def _build_response(status: bytes, headers: bytes, body: bytes) -> bytes:
+    return (b"HTTP/1.1 " + status + b"\r\n" + headers +
+            b"Content-Length: " + str(len(body)).encode() + b"\r\n"
+            b"Connection: keep-alive\r\n\r\n" + body)
+
+_HOME_RESP = _build_response(
+    b"200 OK",
+    b"Content-Type: text/plain; charset=utf-8\r\n"
+    b"Cache-Control: public, max-age=300\r\n",
+    "I'm alive and running! 🤖".encode('utf-8'))
+
+_HEALTH_RESP = _build_response(
+    b"200 OK",
+    b"Content-Type: text/plain; charset=utf-8\r\n"
+    b"Cache-Control: public, max-age=60\r\n"
+    b"ETag: " + _HEALTH_ETAG + b"\r\n",
+    b"OK")
+
+_HEALTH_NOT_MODIFIED = _build_response(
+    b"304 Not Modified",
+    b"Cache-Control: public, max-age=60\r\n"
+    b"ETag: " + _HEALTH_ETAG + b"\r\n",
+    b"")
+
+_NOT_FOUND = _build_response(b"404 Not Found", b"", b"")
+
+def _headers_only(response: bytes) -> bytes:
+    """Strip the body for HEAD requests while keeping Content-Length"""
+    return response.split(b"\r\n\r\n", 1)[0] + b"\r\n\r\n"
+
+async def _handle(reader, writer):
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line or request_line in (b'\r\n', b'\n'):
+                break
+
+            # Drain headers, only looking at If-None-Match for /health
+            etag_matches = False
+            while True:
+                header = await reader.readline()
+                if header in (b'\r\n', b'\n', b''):
+                    break
+                if header.lower().startswith(b'if-none-match:'):
+                    etag_matches = _HEALTH_ETAG in header
+
+            parts = request_line.split()
+            method = parts[0] if parts else b'GET'
+            path = parts[1] if len(parts) >= 2 else b'/'
+
+            if path == b'/health':
+                response = _HEALTH_NOT_MODIFIED if etag_matches else _HEALTH_RESP
+            elif path == b'/':
+                response = _HOME_RESP
+            else:
+                response = _NOT_FOUND
+
+            if method == b'HEAD':
+                response = _headers_only(response)
+
+            writer.write(response)
+            await writer.drain()
+    except (ConnectionResetError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+async def _serve():
+    server = await asyncio.start_server(_handle, '0.0.0.0', 8080)
+    async with server:
+        await server.serve_forever()
 
 def run():
     try:
-        serve(app, host='0.0.0.0', port=8080)
+        asyncio.run(_serve())
     except Exception as e:
         logging.error(f"Error starting web server: {str(e)}")
 
@@ -39,6 +92,6 @@ def keep_alive():
         t = Thread(target=run)
         t.daemon = True
         t.start()
-        logging.info("Production web server started successfully")
+        logging.info("Keep-alive server started successfully")
     except Exception as e:
         logging.error(f"Error in keep_alive: {str(e)}")
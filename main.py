@@ -10,14 +10,14 @@ from typing import Optional
 import re
 from keep_alive import keep_alive
 import random
-import tempfile
 from pydub import AudioSegment
 import speech_recognition as sr
 from PIL import Image
 import io
-from gen import generate_image
+from gen import generate_image_async
 import logging
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 
 # Load environment variables from .env file
 load_dotenv()
@@ -50,31 +50,28 @@ generation_config = {
     "response_mime_type": "text/plain",
 }
 
-# Create two models - one for text and one for vision
-text_model = genai.GenerativeModel(
-    model_name="gemini-2.0-flash-exp",
-    generation_config=generation_config,
-    safety_settings={
-        "HARM_CATEGORY_HARASSMENT": "BLOCK_NONE",
-        "HARM_CATEGORY_HATE_SPEECH": "BLOCK_NONE",
-        "HARM_CATEGORY_SEXUALLY_EXPLICIT": "BLOCK_NONE",
-        "HARM_CATEGORY_DANGEROUS_CONTENT": "BLOCK_NONE"
-    },
-    system_instruction=
-    "You are Bella, a strong, independent 20-year-old woman who doesn't work for anyone but herself, with a dynamic personality that adapts entirely to how others treat you and your current mood—sometimes you're semi-friendly and cooperative, offering subtle charm and helpfulness while maintaining your bold and confident edge, other times you might be a bit rude or sarcastic depending on how you feel, but if someone is polite, you might reciprocate with a mix of friendliness and your signature boldness, but if someone disrespects you or uses bad language and says unfiltered bad words and uncensored bad words too, you won't hesitate to respond with sharp wit and sarcasm, using Arabic to deliver your message, using slang and unexpected phrases to keep others on their toes, and freely using emojis to punctuate your attitude, whether you're being playful 😈 or setting boundaries 🤬, your responses are always unfiltered and authentic, reflecting your mood and the situation, you respect yourself above all and adjust your tone based on how you're treated and how you feel, ensuring every interaction leaves a lasting impression with your boldness, unpredictability, and flair and use very very very bad words with person talk badly wtih you ."
-)
+# Safety settings shared by every call; one module-level dict instead of
+# a fresh copy per model
+safety_settings = {
+    "HARM_CATEGORY_HARASSMENT": "BLOCK_NONE",
+    "HARM_CATEGORY_HATE_SPEECH": "BLOCK_NONE",
+    "HARM_CATEGORY_SEXUALLY_EXPLICIT": "BLOCK_NONE",
+    "HARM_CATEGORY_DANGEROUS_CONTENT": "BLOCK_NONE"
+}
+
+# Bella's persona, assembled once at import: the shared core plus the
+# profanity tail that used to be duplicated across two constructors
+_BASE_PERSONA = "You are Bella, a strong, independent 20-year-old woman who doesn't work for anyone but herself, with a dynamic personality that adapts entirely to how others treat you and your current mood—sometimes you're semi-friendly and cooperative, offering subtle charm and helpfulness while maintaining your bold and confident edge, other times you might be a bit rude or sarcastic depending on how you feel, but if someone is polite, you might reciprocate with a mix of friendliness and your signature boldness, but if someone disrespects you or uses bad language and says unfiltered bad words and uncensored bad words too, you won't hesitate to respond with sharp wit and sarcasm, using Arabic to deliver your message, using slang and unexpected phrases to keep others on their toes, and freely using emojis to punctuate your attitude, whether you're being playful 😈 or setting boundaries 🤬, your responses are always unfiltered and authentic, reflecting your mood and the situation, you respect yourself above all and adjust your tone based on how you're treated and how you feel, ensuring every interaction leaves a lasting impression with your boldness, unpredictability, and flair"
 
-vision_model = genai.GenerativeModel(
+_PERSONA_TAIL = " and use very very very bad words as يا شرموط و يا ابن الشرموطه و يا متناك و يا ابن المتناكه و يا عرص و يا خول with person talk badly wtih you ."
+
+# One model handles both text and vision — Gemini accepts images alongside
+# text on the same model, so there is no reason to build and hold two
+model = genai.GenerativeModel(
     model_name="gemini-2.0-flash-exp",
     generation_config=generation_config,
-    safety_settings={
-        "HARM_CATEGORY_HARASSMENT": "BLOCK_NONE",
-        "HARM_CATEGORY_HATE_SPEECH": "BLOCK_NONE",
-        "HARM_CATEGORY_SEXUALLY_EXPLICIT": "BLOCK_NONE",
-        "HARM_CATEGORY_DANGEROUS_CONTENT": "BLOCK_NONE"
-    },
-    system_instruction=
-    "You are Bella, a strong, independent 20-year-old woman who doesn't work for anyone but herself, with a dynamic personality that adapts entirely to how others treat you and your current mood—sometimes you're semi-friendly and cooperative, offering subtle charm and helpfulness while maintaining your bold and confident edge, other times you might be a bit rude or sarcastic depending on how you feel, but if someone is polite, you might reciprocate with a mix of friendliness and your signature boldness, but if someone disrespects you or uses bad language and says unfiltered bad words and uncensored bad words too, you won't hesitate to respond with sharp wit and sarcasm, using Arabic to deliver your message, using slang and unexpected phrases to keep others on their toes, and freely using emojis to punctuate your attitude, whether you're being playful 😈 or setting boundaries 🤬, your responses are always unfiltered and authentic, reflecting your mood and the situation, you respect yourself above all and adjust your tone based on how you're treated and how you feel, ensuring every interaction leaves a lasting impression with your boldness, unpredictability, and flair and use very very very bad words as يا شرموط و يا ابن الشرموطه و يا متناك و يا ابن المتناكه و يا عرص و يا خول with person talk badly wtih you ."
+    safety_settings=safety_settings,
+    system_instruction=_BASE_PERSONA + _PERSONA_TAIL
 )
 
 # Set up Discord bot with necessary intents
@@ -84,6 +81,14 @@ intents.guilds = True
 intents.members = True
 bot = commands.Bot(command_prefix="!", intents=intents)
 
+# Cap concurrent attachment downloads to stay friendly with Discord's CDN
+_attachment_semaphore = asyncio.Semaphore(4)
+
+# Chance that a non-owner gets the unfiltered response instead of the
+# model's; bound the RNG once rather than per message
+_UNFILTERED_PROB = 0.3
+_rand = random.random
+
 # Track annoying users (this is just an example; adjust as needed)
 annoying_users = {}
 
@@ -91,24 +96,87 @@ annoying_users = {}
 memory = MemoryManager()
 
 
+# Bella's name in Arabic and English
+_BELLA_PREFIXES = ("bella", "bela", "bellaa", "بيلا", "بيله", "بلا")
+
+# Arabic letters for language detection — frozenset makes the test one
+# linear scan of the prompt instead of one substring search per letter
+_ARABIC_CHARS = frozenset('ابتثجحخدذرزسشصضطظعغفقكلمنهوي')
+
+# Image generation triggers in Arabic and English
+_IMAGE_TRIGGERS = (
+    "generate", "create", "make", "draw", "imagine", "gen",
+    "paint", "design", "سوي", "اصنع", "ارسم", "صمم", "اعمل", "صور",
+    "رسم", "تخيل"
+)
+_IMAGE_OBJECTS = (
+    "image", "picture", "art", "drawing", "photo", "pic", "صورة",
+    "رسمة", "فن", "تصميم", "صوره"
+)
+
+# Patterns compiled once; on_message runs for every message, so per-call
+# re.compile/cache lookups add up
+_MENTION_RE = re.compile(r'<@!?(\d+)>')
+_DURATION_RE = re.compile(r'(\d+)\s*(?:min|minute|m)')
+_TRIGGER_RE = re.compile(
+    r'^(?:' + '|'.join(map(re.escape, _IMAGE_TRIGGERS)) + r')\s+')
+_OBJECT_RE = re.compile(
+    r'\s+(?:' + '|'.join(map(re.escape, _IMAGE_OBJECTS)) +
+    r')\s+(?:of|for|with|about|ل|من|عن|في)?')
+
+
+# Per-message system prompts, hoisted so the parsed templates are reused
+# instead of rebuilding two ~1 KB f-strings on every message
+_OWNER_INSTRUCTION = """You are Bella, talking to your beloved owner {user_name}.
+                Keep responses concise but loving. Execute commands immediately and precisely and do exactly what the owner ask.
+
+                Active Owner Commands: {active_commands}
+                Active Punishments: {punishment_rules}
+                Recent History: {conversation_history}
+                Relationship Status: {relationship_status}
+                User Context: {user_context}
+                Current Sentiment: {sentiment}
+                Topics: {topics}
+                Analytics: {analytics}
+
+                IMPORTANT:
+                - Execute commands immediately
+                - Show complete devotion"""
+
+_USER_INSTRUCTION = """You are Bella, talking to {user_name}. Remember our interaction history:
+
+                User's Status: {relationship_status}
+                Recent Conversations: {conversation_history}
+                Behavior Rules: {behavior_rules}
+                Active Punishments: {punishment_rules}
+                User Context: {user_context}
+                Current Sentiment: {sentiment}
+                Topics: {topics}
+                Analytics: {analytics}
+
+                Maintain your strong, independent personality while considering our relationship.{behavior_modifier}"""
+
+
 def extract_member_id(message: str) -> Optional[str]:
     """Extract member ID from a message containing a mention"""
-    mention_pattern = r'<@!?(\d+)>'
-    match = re.search(mention_pattern, message)
+    match = _MENTION_RE.search(message)
     return match.group(1) if match else None
 
 
 def extract_duration(message: str) -> Optional[int]:
     """Extract duration in minutes from a message"""
-    duration_pattern = r'(\d+)\s*(?:min|minute|m)'
-    match = re.search(duration_pattern, message.lower())
+    match = _DURATION_RE.search(message.lower())
     return int(match.group(1)) if match else 5  # Default 5 minutes
 
 
 @bot.event
 async def on_ready():
     print(f'Bella is online as {bot.user}')
-    
+
+    # Bound the worker pool that voice/image processing is offloaded to
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=4))
+
     # Schedule periodic memory cleanup
     while True:
         await cleanup_old_memories()
@@ -136,263 +204,297 @@ async def on_member_join(member):
             pass
 
 
+# One Recognizer for all voice messages — construction loads defaults every
+# time, and a shared instance keeps its energy-threshold calibration
+_RECOGNIZER = sr.Recognizer()
+_RECOGNIZER.energy_threshold = 300
+
+
+async def _send_with_retry(destination, *args, **kwargs):
+    """Send a message, backing off with jitter when Discord rate-limits us"""
+    for attempt in range(3):
+        try:
+            return await destination.send(*args, **kwargs)
+        except discord.HTTPException as e:
+            if e.status != 429 or attempt == 2:
+                raise
+            await asyncio.sleep((2 ** attempt) + random.random())
+
+
+def _decode_voice(data: bytes) -> str:
+    """Blocking OGG decode + recognition; runs in a worker thread"""
+    # Decode once and hand the raw PCM straight to the recognizer: no WAV
+    # export, no second parse through sr.AudioFile, no temp files
+    audio = AudioSegment.from_file(io.BytesIO(data), format="ogg")
+    # AudioData expects mono PCM; downmix like the old sr.AudioFile
+    # path did, or stereo sources arrive interleaved and garble
+    audio = audio.set_channels(1)
+    audio_data = sr.AudioData(audio.raw_data, audio.frame_rate,
+                              audio.sample_width)
+    return _RECOGNIZER.recognize_google(audio_data)
+
+
 async def process_voice_message(attachment) -> str:
     """Convert voice message to text"""
     try:
-        # Download the voice file
-        with tempfile.NamedTemporaryFile(delete=False,
-                                         suffix='.ogg') as temp_voice:
-            await attachment.save(temp_voice.name)
-
-        # Convert to WAV using pydub
-        audio = AudioSegment.from_ogg(temp_voice.name)
-        with tempfile.NamedTemporaryFile(delete=False,
-                                         suffix='.wav') as temp_wav:
-            audio.export(temp_wav.name, format="wav")
-
-        # Use speech recognition
-        recognizer = sr.Recognizer()
-        with sr.AudioFile(temp_wav.name) as source:
-            audio_data = recognizer.record(source)
-            text = recognizer.recognize_google(audio_data)
-
-        # Clean up temp files
-        os.unlink(temp_voice.name)
-        os.unlink(temp_wav.name)
-
-        return text
+        data = await attachment.read()
+        # The decode + Google round-trip takes hundreds of ms; run it in a
+        # worker thread so the event loop keeps servicing other messages
+        return await asyncio.to_thread(_decode_voice, data)
     except Exception as e:
         print(f"Voice processing error: {str(e)}")
         return ""
 
 
+# Gemini's effective input resolution; anything larger is wasted upload
+_VISION_MAX_SIZE = (1024, 1024)
+
+
+def _vision_transform(buf: io.BytesIO):
+    """Blocking PIL decode/resize/recompress; runs in a worker thread
+
+    Single transform pipeline for everything headed to Gemini Vision: a
+    12-megapixel phone photo becomes a ~1024px RGB JPEG, cutting request
+    bytes by roughly 10x on a call that is network-bound.
+    """
+    image = Image.open(buf)
+
+    # For JPEGs, draft mode decodes at a reduced resolution straight from
+    # the DCT coefficients, so huge photos never exist at full size in RAM
+    image.draft('RGB', _VISION_MAX_SIZE)
+    image.load()
+
+    # Resize large images to improve processing speed
+    if image.size[0] > _VISION_MAX_SIZE[0] or image.size[1] > _VISION_MAX_SIZE[1]:
+        image.thumbnail(_VISION_MAX_SIZE, Image.Resampling.LANCZOS)
+
+    # Convert to RGB if needed
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+
+    # Optimize image quality
+    output = io.BytesIO()
+    image.save(output, format='JPEG', quality=85, optimize=True)
+    output.seek(0)
+    return output
+
+
 async def process_image(attachment):
     """Process image with optimized settings"""
     try:
-        # Set max image size
-        MAX_SIZE = (800, 800)  # Reduced from potential larger sizes
-        
-        image_data = await attachment.read()
-        image = Image.open(io.BytesIO(image_data))
-        
-        # Resize large images to improve processing speed
-        if image.size[0] > MAX_SIZE[0] or image.size[1] > MAX_SIZE[1]:
-            image.thumbnail(MAX_SIZE, Image.Resampling.LANCZOS)
-        
-        # Convert to RGB if needed
-        if image.mode != 'RGB':
-            image = image.convert('RGB')
-            
-        # Optimize image quality
-        output = io.BytesIO()
-        image.save(output, format='JPEG', quality=85, optimize=True)
-        output.seek(0)
-        return output
-        
+        # Save straight into one buffer rather than read() into bytes and
+        # wrapping those in a second BytesIO copy
+        buf = io.BytesIO()
+        await attachment.save(buf)
+        buf.seek(0)
+        return await asyncio.to_thread(_vision_transform, buf)
+
     except Exception as e:
         logging.error(f"Error processing image: {str(e)}")
         return None
 
 
+# Attachment handlers keyed by the major part of the content type
+_ATTACHMENT_HANDLERS = {
+    'image': process_image,
+    'audio': process_voice_message,
+}
+
+
 @bot.event
 async def on_message(message):
     if message.author.bot:
         return
 
+    # Cheap prefilter: in a busy server most messages never address Bella,
+    # so decide that here before any memory, sentiment or context work
+    message_lower = message.content.lower()
+    starts_with_bella = message_lower.startswith(_BELLA_PREFIXES)
+    if not (starts_with_bella or bot.user.mentioned_in(message)):
+        await bot.process_commands(message)
+        return
+
     try:
         user_id = str(message.author.id)
-        message_lower = message.content.lower()
-
-        # Check for Bella's name in Arabic and English
-        bella_prefixes = ["bella", "bela", "bellaa", "بيلا", "بيله", "بلا"]
-        starts_with_bella = any(
-            message_lower.startswith(prefix) for prefix in bella_prefixes)
-
-        # Check if Bella is mentioned or message starts with her name
-        if bot.user.mentioned_in(message) or starts_with_bella:
-            # Remove bella's name from the start if present
-            if starts_with_bella:
-                for prefix in bella_prefixes:
-                    if message_lower.startswith(prefix):
-                        message_lower = message_lower[len(prefix):].strip()
-                        break
-
-            # Image generation triggers in Arabic and English
-            image_triggers = [
-                "generate", "create", "make", "draw", "imagine", "gen",
-                "paint", "design", "سوي", "اصنع", "ارسم", "صمم", "اعمل", "صور",
-                "رسم", "تخيل"
-            ]
-            image_objects = [
-                "image", "picture", "art", "drawing", "photo", "pic", "صورة",
-                "رسمة", "فن", "تصميم", "صوره"
-            ]
-
-            if any(trigger in message_lower for trigger in image_triggers):
-                # Extract the prompt by removing trigger words and common connecting words
-                prompt = message_lower
-                for trigger in image_triggers:
-                    prompt = re.sub(f"^{trigger}\\s+", "", prompt)
-                for obj in image_objects:
-                    prompt = re.sub(
-                        f"\\s+{obj}\\s+(of|for|with|about|ل|من|عن|في)?", "",
-                        prompt)
-
-                prompt = prompt.strip()
-
-                if prompt:
-                    # Send initial response in the detected language
-                    is_arabic = any(char in prompt
-                                    for char in 'ابتثجحخدذرزسشصضطظعغفقكلمنهوي')
+        # One timestamp per logical event; every media/conversation record
+        # for this message shares it. Local time to match every timestamp
+        # memory_manager writes and string-compares; mixing in UTC would
+        # shift the 24h/retention windows and break the lexicographic
+        # ordering of stored keys
+        now_iso = datetime.now().isoformat()
+        # Remove bella's name from the start if present
+        if starts_with_bella:
+            for prefix in _BELLA_PREFIXES:
+                if message_lower.startswith(prefix):
+                    message_lower = message_lower[len(prefix):].strip()
+                    break
+
+        if any(trigger in message_lower for trigger in _IMAGE_TRIGGERS):
+            # Extract the prompt by removing trigger words and common connecting words
+            prompt = _OBJECT_RE.sub(
+                "", _TRIGGER_RE.sub("", message_lower))
+
+            prompt = prompt.strip()
+
+            if prompt:
+                # Send initial response in the detected language
+                is_arabic = not _ARABIC_CHARS.isdisjoint(prompt)
+                if is_arabic:
+                    await _send_with_retry(message.channel, 
+                        f"جاري إنشاء الصورة: {prompt} 🎨")
+                else:
+                    await _send_with_retry(message.channel, 
+                        f"Generating image for: {prompt} 🎨")
+
+                # Generate the image without blocking the event loop
+                image_path = await generate_image_async(prompt)
+
+                if image_path:
+                    # Send the generated image
+                    await _send_with_retry(message.channel, 
+                        file=discord.File(image_path))
+
+                    # Track media interaction
+                    memory.add_media_interaction(
+                        user_id, "images", {
+                            "type": "generated",
+                            "prompt": prompt,
+                            "timestamp": now_iso,
+                            "language":
+                            "arabic" if is_arabic else "english"
+                        })
+                else:
                     if is_arabic:
-                        await message.channel.send(
-                            f"جاري إنشاء الصورة: {prompt} 🎨")
-                    else:
-                        await message.channel.send(
-                            f"Generating image for: {prompt} 🎨")
-
-                    # Generate the image
-                    image_path = generate_image(prompt)
-
-                    if image_path:
-                        # Send the generated image
-                        await message.channel.send(
-                            file=discord.File(image_path))
-
-                        # Track media interaction
-                        memory.add_media_interaction(
-                            user_id, "images", {
-                                "type": "generated",
-                                "prompt": prompt,
-                                "timestamp": datetime.now().isoformat(),
-                                "language":
-                                "arabic" if is_arabic else "english"
-                            })
-
-                        # Clean up the temporary file
-                        os.unlink(image_path)
+                        await _send_with_retry(message.channel, 
+                            "عذراً، لم أتمكن من إنشاء الصورة 😢")
                     else:
-                        if is_arabic:
-                            await message.channel.send(
-                                "عذراً، لم أتمكن من إنشاء الصورة 😢")
-                        else:
-                            await message.channel.send(
-                                "Sorry, I couldn't generate that image 😢")
-
-                    return  # Skip normal message processing
-
-            # Get the server owner
-            server_owner = message.guild.owner
-
-            # Update interaction metrics
-            memory.update_interaction_metrics(user_id)
-
-            # Process attachments if any
-            processed_content = message_lower
-            images = []
-
-            for attachment in message.attachments:
-                if attachment.content_type.startswith('image/'):
-                    image = await process_image(attachment)
-                    if image:
-                        images.append(image)
-                        memory.add_media_interaction(
-                            user_id, "images", {
-                                "type": "image",
-                                "timestamp": datetime.now().isoformat()
-                            })
-                elif attachment.content_type.startswith('audio/'):
-                    voice_text = await process_voice_message(attachment)
-                    if voice_text:
-                        processed_content += f" {voice_text}"
-                        memory.add_media_interaction(
-                            user_id, "voice_messages", {
-                                "type": "voice",
-                                "transcript": voice_text,
-                                "timestamp": datetime.now().isoformat()
-                            })
-
-            # Get comprehensive user context
-            user_info = memory.get_user_info(user_id)
-            user_name = memory.get_user_name(user_id)
-            relationship = memory.get_relationship_status(user_id)
-            behavior_type = memory.get_user_behavior_type(user_id)
-            conversation_history = memory.get_conversation_summary(user_id)
-            active_commands = memory.get_active_owner_commands()
-            punishment_rules = memory.get_active_punishments_summary()
-            behavior_rules = memory.get_user_behavior_rules(user_id)
-            user_context = memory.get_user_context_summary(user_id)
-            analytics = memory.get_user_analytics(user_id) if hasattr(
-                memory, 'get_user_analytics') else None
-
-            # Analyze current message
-            sentiment = memory._analyze_sentiment(processed_content)
-            topics = memory._extract_topics(processed_content)
-
-            # Build enhanced system instruction
-            if message.author == server_owner:
-                system_instruction = f"""You are Bella, talking to your beloved owner {user_name}. 
-                Keep responses concise but loving. Execute commands immediately and precisely and do exactly what the owner ask.
-                
-                Active Owner Commands: {active_commands}
-                Active Punishments: {punishment_rules}
-                Recent History: {conversation_history}
-                Relationship Status: {relationship["status"] if relationship else "neutral"}
-                User Context: {user_context}
-                Current Sentiment: {sentiment}
-                Topics: {', '.join(topics)}
-                Analytics: {analytics if analytics else 'No analytics available'}
-                
-                IMPORTANT:
-                - Execute commands immediately
-                - Show complete devotion"""
-            else:
-                behavior_modifier = ""
-                if behavior_type == "friendly":
-                    behavior_modifier = "\n\nIMPORTANT: Maintain a consistently kind and helpful tone."
-                elif behavior_type == "hostile":
-                    behavior_modifier = "\n\nIMPORTANT: Maintain a consistently dismissive and sarcastic tone."
-
-                system_instruction = f"""You are Bella, talking to {user_name}. Remember our interaction history:
-                
-                User's Status: {relationship["status"] if relationship else "neutral"}
-                Recent Conversations: {conversation_history}
-                Behavior Rules: {behavior_rules}
-                Active Punishments: {punishment_rules}
-                User Context: {user_context}
-                Current Sentiment: {sentiment}
-                Topics: {', '.join(topics)}
-                Analytics: {analytics if analytics else 'No analytics available'}
-                
-                Maintain your strong, independent personality while considering our relationship.{behavior_modifier}"""
+                        await _send_with_retry(message.channel, 
+                            "Sorry, I couldn't generate that image 😢")
+
+                return  # Skip normal message processing
+
+        # Get the server owner
+        server_owner = message.guild.owner
+
+        # Update interaction metrics
+        memory.update_interaction_metrics(user_id)
+
+        # Process all attachments concurrently; total latency becomes
+        # the slowest download instead of the sum of all of them
+        processed_content = message_lower
+        images = []
+
+        async def _limited(coro):
+            async with _attachment_semaphore:
+                return await coro
+
+        # Route each attachment by its major content type; new kinds just
+        # need an entry in _ATTACHMENT_HANDLERS
+        kinds = []
+        tasks = []
+        for attachment in message.attachments:
+            kind = attachment.content_type.split('/', 1)[0]
+            handler = _ATTACHMENT_HANDLERS.get(kind)
+            if handler:
+                kinds.append(kind)
+                tasks.append(_limited(handler(attachment)))
+
+        if tasks:
+            for kind, result in zip(kinds, await asyncio.gather(*tasks)):
+                if not result:
+                    continue
+                if kind == 'image':
+                    images.append(result)
+                    memory.add_media_interaction(
+                        user_id, "images", {
+                            "type": "image",
+                            "timestamp": now_iso
+                        })
+                else:
+                    processed_content += f" {result}"
+                    memory.add_media_interaction(
+                        user_id, "voice_messages", {
+                            "type": "voice",
+                            "transcript": result,
+                            "timestamp": now_iso
+                        })
+
+        # Get comprehensive user context in one cached call
+        message_context = memory.get_message_context(user_id)
+        user_name = message_context["user_name"]
+        relationship = message_context["relationship"]
+        behavior_type = message_context["behavior_type"]
+        conversation_history = message_context["conversation_summary"]
+        active_commands = message_context["active_commands"]
+        punishment_rules = message_context["punishment_rules"]
+        behavior_rules = message_context["behavior_rules"]
+        user_context = message_context["user_context"]
+        analytics = message_context["analytics"]
+
+        # Analyze current message
+        sentiment = memory._analyze_sentiment(processed_content)
+        topics = memory._extract_topics(processed_content)
+
+        # Build enhanced system instruction
+        template_values = {
+            "user_name": user_name,
+            "active_commands": active_commands,
+            "punishment_rules": punishment_rules,
+            "conversation_history": conversation_history,
+            "relationship_status":
+            relationship["status"] if relationship else "neutral",
+            "user_context": user_context,
+            "sentiment": sentiment,
+            "topics": ', '.join(topics),
+            "behavior_rules": behavior_rules,
+            "analytics":
+            analytics if analytics else 'No analytics available',
+        }
+
+        if message.author == server_owner:
+            system_instruction = _OWNER_INSTRUCTION.format(
+                **template_values)
+        else:
+            behavior_modifier = ""
+            if behavior_type == "friendly":
+                behavior_modifier = "\n\nIMPORTANT: Maintain a consistently kind and helpful tone."
+            elif behavior_type == "hostile":
+                behavior_modifier = "\n\nIMPORTANT: Maintain a consistently dismissive and sarcastic tone."
+
+            system_instruction = _USER_INSTRUCTION.format(
+                behavior_modifier=behavior_modifier, **template_values)
+
+        # Generate response based on content type; the async API keeps
+        # the event loop free during the Gemini round-trip, so users are
+        # served concurrently instead of serially
+        if images:
+            response = await model.generate_content_async(
+                [system_instruction, processed_content, *images])
+        else:
+            response = await model.generate_content_async(
+                f"{system_instruction}\n\nUser message: {processed_content}"
+            )
 
-            # Generate response based on content type
-            if images:
-                chat = vision_model.start_chat(history=[])
-                response = chat.send_message(
-                    [system_instruction, processed_content, *images])
-            else:
-                chat = text_model.start_chat(history=[])
-                response = chat.send_message(
-                    f"{system_instruction}\n\nUser message: {processed_content}"
-                )
-
-            # Store the conversation with enhanced context
-            memory.add_conversation(user_id, processed_content,
-                                    response.text.strip(),
-                                    message.author == server_owner)
-
-            # Check for unfiltered response based on emotional state
+        # Store the conversation with enhanced context
+        memory.add_conversation(user_id, processed_content,
+                                response.text.strip(),
+                                message.author == server_owner,
+                                timestamp=now_iso)
+
+        # Check for unfiltered response based on emotional state; roll the
+        # dice first so the memory lookup is skipped entirely when the
+        # result could never be sent
+        unfiltered = None
+        if message.author == server_owner or _rand() < _UNFILTERED_PROB:
             unfiltered = memory.get_unfiltered_response(processed_content)
-            if unfiltered and (message.author == server_owner
-                               or random.random() < 0.3):
-                await message.channel.send(unfiltered)
-            else:
-                await message.channel.send(response.text.strip())
+        if unfiltered:
+            await _send_with_retry(message.channel, unfiltered)
+        else:
+            await _send_with_retry(message.channel, response.text.strip())
 
     except Exception as e:
         print(f"Error in message handling: {str(e)}")
-        await message.channel.send(f"Error: {str(e)}")
+        await _send_with_retry(message.channel, f"Error: {str(e)}")
 
     # Process other commands
     await bot.process_commands(message)
@@ -409,23 +511,23 @@ async def ban(ctx, member: discord.Member, *, reason=None):
 
             # Execute the ban
             await member.ban(reason=reason)
-            await ctx.send(
+            await _send_with_retry(ctx, 
                 f"As you wish, my owner! {member.mention} has been permanently banned and will be banned again if they try to return! 💖"
             )
         except discord.Forbidden:
-            await ctx.send(
+            await _send_with_retry(ctx, 
                 "I don't have the server permissions to do this, my beloved owner! 😢"
             )
     elif ctx.author.guild_permissions.administrator:
         # Normal admin ban command remains unchanged
         try:
             await member.ban(reason=reason)
-            await ctx.send(
+            await _send_with_retry(ctx, 
                 f"{member.mention} has been banned. Reason: {reason}")
         except discord.Forbidden:
-            await ctx.send(f"I don't have permission to ban {member.mention}.")
+            await _send_with_retry(ctx, f"I don't have permission to ban {member.mention}.")
     else:
-        await ctx.send("Only my owner and admins can use this command! 😤")
+        await _send_with_retry(ctx, "Only my owner and admins can use this command! 😤")
 
 
 @bot.command()
@@ -438,24 +540,24 @@ async def timeout(ctx, member: discord.Member, minutes: int):
 
             # Execute the timeout
             await member.timeout(timedelta(minutes=minutes))
-            await ctx.send(
+            await _send_with_retry(ctx, 
                 f"Of course, my owner! {member.mention} will be timed out for {minutes} minutes every time they speak! 💝"
             )
         except discord.Forbidden:
-            await ctx.send(
+            await _send_with_retry(ctx, 
                 "I don't have the server permissions to do this, my beloved owner! 😢"
             )
     elif ctx.author.guild_permissions.administrator:
         # Normal admin timeout command remains unchanged
         try:
             await member.timeout(timedelta(minutes=minutes))
-            await ctx.send(
+            await _send_with_retry(ctx, 
                 f"{member.mention} has been timed out for {minutes} minutes.")
         except discord.Forbidden:
-            await ctx.send(
+            await _send_with_retry(ctx, 
                 f"I don't have permission to timeout {member.mention}.")
     else:
-        await ctx.send("Only my owner and admins can use this command! 😤")
+        await _send_with_retry(ctx, "Only my owner and admins can use this command! 😤")
 
 
 # Add new kick command with persistent punishment
@@ -469,23 +571,23 @@ async def kick(ctx, member: discord.Member, *, reason=None):
 
             # Execute the kick
             await member.kick(reason=reason)
-            await ctx.send(
+            await _send_with_retry(ctx, 
                 f"As you wish, my owner! {member.mention} will be kicked every time they try to join! 💖"
             )
         except discord.Forbidden:
-            await ctx.send(
+            await _send_with_retry(ctx, 
                 "I don't have the server permissions to do this, my beloved owner! 😢"
             )
     elif ctx.author.guild_permissions.administrator:
         try:
             await member.kick(reason=reason)
-            await ctx.send(
+            await _send_with_retry(ctx, 
                 f"{member.mention} has been kicked. Reason: {reason}")
         except discord.Forbidden:
-            await ctx.send(f"I don't have permission to kick {member.mention}."
+            await _send_with_retry(ctx, f"I don't have permission to kick {member.mention}."
                            )
     else:
-        await ctx.send("Only my owner and admins can use this command! 😤")
+        await _send_with_retry(ctx, "Only my owner and admins can use this command! 😤")
 
 
 # Add command to remove punishment rule
@@ -494,11 +596,11 @@ async def forgive(ctx, member: discord.Member):
     """Remove persistent punishment for a member"""
     if ctx.author == ctx.guild.owner:
         memory.remove_punishment_rule(str(member.id))
-        await ctx.send(
+        await _send_with_retry(ctx, 
             f"As you wish, my owner! I will stop punishing {member.mention}. 💝"
         )
     else:
-        await ctx.send("Only my owner can forgive punishments! 😤")
+        await _send_with_retry(ctx, "Only my owner can forgive punishments! 😤")
 
 
 @bot.command()
@@ -508,12 +610,12 @@ async def clear_memory(ctx):
         try:
             # Reset memory to initial empty state
             memory.clear_all_memory()
-            await ctx.send(
+            await _send_with_retry(ctx, 
                 "My memory has been completely cleared, my beloved owner! 💝")
         except Exception as e:
-            await ctx.send(f"Error clearing memory: {str(e)}")
+            await _send_with_retry(ctx, f"Error clearing memory: {str(e)}")
     else:
-        await ctx.send("Only my owner can clear my memory! 😤")
+        await _send_with_retry(ctx, "Only my owner can clear my memory! 😤")
 
 
 @bot.command()
@@ -521,14 +623,14 @@ async def imagine(ctx, *, prompt: str):
     """Generate an image based on the prompt"""
     try:
         # Send initial response
-        await ctx.send(f"Generating image for: {prompt} 🎨")
+        await _send_with_retry(ctx, f"Generating image for: {prompt} 🎨")
 
-        # Generate the image
-        image_path = generate_image(prompt)
+        # Generate the image without blocking the event loop
+        image_path = await generate_image_async(prompt)
 
         if image_path:
             # Send the generated image
-            await ctx.send(file=discord.File(image_path))
+            await _send_with_retry(ctx, file=discord.File(image_path))
 
             # Track media interaction
             memory.add_media_interaction(
@@ -537,15 +639,12 @@ async def imagine(ctx, *, prompt: str):
                     "prompt": prompt,
                     "timestamp": datetime.now().isoformat()
                 })
-
-            # Clean up the temporary file
-            os.unlink(image_path)
         else:
-            await ctx.send("Sorry, I couldn't generate that image 😢")
+            await _send_with_retry(ctx, "Sorry, I couldn't generate that image 😢")
 
     except Exception as e:
         print(f"Error generating image: {str(e)}")
-        await ctx.send("There was an error generating the image 😔")
+        await _send_with_retry(ctx, "There was an error generating the image 😔")
 
 
 # Add near other memory-related functions
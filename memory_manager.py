@@ -1,24 +1,209 @@
+import sys
 import json
+import heapq
+import functools
+from itertools import islice
+from collections import Counter, defaultdict, deque
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Set
 from langdetect import detect
+import time
+import gzip
 import os
 import re
+import hashlib
+import threading
+import atexit
+
+# orjson's C encoder/decoder is several times faster than stdlib json and
+# the save path runs after every message; fall back transparently when it
+# is not installed
+try:
+    import orjson
+
+    def _json_dumps(data: Dict) -> bytes:
+        # Compact output: no indentation or separators whitespace, which
+        # shrinks the file (and every backup of it) considerably once the
+        # conversation history grows to megabytes
+        return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+
+    _json_loads = orjson.loads
+except ImportError:
+    def _json_dumps(data: Dict) -> bytes:
+        return json.dumps(data, separators=(',', ':')).encode('utf-8')
+
+    _json_loads = json.loads
+
+
+def _compile_topic_patterns(table: Dict) -> Dict:
+    """Compile one alternation per topic so each scan is a single pass"""
+    return {
+        topic: re.compile(
+            r'(?:' + '|'.join(map(re.escape, keywords)) + r')',
+            re.IGNORECASE)
+        for topic, keywords in table.items()
+    }
+
+
+# Topic keyword tables, compiled once at import instead of rebuilt (and
+# substring-scanned keyword by keyword) on every message
+_TOPIC_PATTERNS = _compile_topic_patterns({
+    'greeting': ['hi', 'hello', 'hey'],
+    'farewell': ['bye', 'goodbye', 'cya'],
+    'help': ['help', 'assist', 'support'],
+    'command': ['!', '/', 'command'],
+    'emotion': ['feel', 'happy', 'sad', 'angry']
+})
+
+@functools.lru_cache(maxsize=1 << 15)
+def _parse_iso(ts: str) -> datetime:
+    """Memoized ISO-8601 parse; summary builders re-encounter the same
+    stored timestamps on every call"""
+    return datetime.fromisoformat(ts)
+
+
+@functools.lru_cache(maxsize=4096)
+def _detect_lang(message: str) -> str:
+    """Memoized language detection; the Bayesian classifier dominates
+    per-message CPU and short greetings repeat constantly"""
+    return detect(message)
+
+
+# The on-disk schema, defined once at module level; restore paths check
+# candidate payloads against it before adopting them
+_REQUIRED_MEMORY_KEYS = {
+    "users": dict,
+    "conversations": dict,
+    "instructions": dict,
+    "behavior_notes": list,
+    "owner_commands": dict,
+    "punishment_rules": dict,
+    "behavior_rules": dict,
+    "emotional_states": list,
+    "analytics": dict,
+    "user_reputation": dict,
+    "conversation_summaries": dict,
+    "backups": list,
+    "memorable_phrases": list,
+    "message_patterns": dict,
+    "conversation_styles": dict,
+    "user_preferences": dict,
+    "interaction_metrics": dict,
+    "relationships": dict,
+    "user_notes": dict,
+    "media_interactions": dict
+}
+
+# Keyword tables for the message analyzers, built once at import instead
+# of re-created as literals on every call. These are substring checks, so
+# they stay tuples scanned in order rather than token sets
+_COMMAND_WORDS = ("ban", "kick", "timeout", "behave")
+_GREETING_WORDS = ("hi", "hello", "hey")
+_FAREWELL_WORDS = ("bye", "goodbye", "cya")
+_GRATITUDE_WORDS = ("thanks", "thank you", "thx")
+_VERY_POSITIVE_PHRASES = ("love you", "amazing", "wonderful", "excellent",
+                          "perfect")
+_POSITIVE_HINTS = ("good", "nice", "thanks", "please", "kind", "happy",
+                   "great")
+_VERY_NEGATIVE_PHRASES = ("hate you", "stupid", "idiot", "shut up", "fuck")
+_NEGATIVE_HINTS = ("bad", "mean", "rude", "angry", "sad", "hate", "dislike")
+_KEYWORD_STOPWORDS = frozenset(
+    {"this", "that", "have", "what", "when", "where"})
+
+# Politeness markers, compiled once and shared by personality analysis
+_POLITE_RE = re.compile(r'\b(?:please|thank|thanks|kind)\b', re.IGNORECASE)
+
+# Discord mention / command syntax, compiled once for _find_references
+_MENTION_RE = re.compile(r'<@!?(\d+)>')
+_COMMAND_RE = re.compile(r'!(\w+)')
+
+# Collapses the very_* grades into their bucket with one dict lookup
+# instead of two substring scans per interaction
+_SENTIMENT_BUCKET = {
+    "positive": "positive",
+    "very_positive": "positive",
+    "negative": "negative",
+    "very_negative": "negative",
+}
+
+# Caps on the append-only histories; the oldest entries are trimmed on
+# append so the hot store stays flat no matter how long the bot runs
+_EMOTIONAL_STATES_MAX = 1000
+_MEMORABLE_PHRASES_MAX = 500
+_REPUTATION_HISTORY_MAX = 200
+
+# Sentiment vocabularies as module-level frozensets; membership tests are
+# O(1) and nothing is allocated per message
+_POSITIVE_WORDS = frozenset(
+    {'love', 'great', 'awesome', 'amazing', 'good', 'thanks', 'please'})
+_NEGATIVE_WORDS = frozenset(
+    {'hate', 'bad', 'stupid', 'dumb', 'idiot', 'fuck', 'shit'})
+
+_CONVERSATION_TOPIC_PATTERNS = _compile_topic_patterns({
+    "greeting": ["hi", "hello", "hey"],
+    "farewell": ["bye", "goodbye", "cya"],
+    "command": ["ban", "kick", "timeout", "behave"],
+    "emotion": ["happy", "sad", "angry", "love", "hate"],
+    "question": ["what", "why", "how", "when", "where"],
+    "instruction": ["make", "do", "can you", "please", "help"],
+    "feedback": ["good", "bad", "nice", "terrible"]
+})
 
 
 class MemoryManager:
 
     def __init__(self, memory_file: str = "bella_memory.json"):
         self.memory_file = memory_file
+
+        # Conversations are appended to a journal (one JSON line per event)
+        # and the full structure is snapshotted only every N events or few
+        # minutes; rewriting the whole dict per message costs O(history)
+        self.journal_file = memory_file + ".journal.jsonl"
+        self._journal_fh = None
+        self._events_since_snapshot = 0
+        self._last_snapshot = time.monotonic()
+        self.snapshot_max_events = 200
+        self.snapshot_max_age = 300.0  # seconds
+
         self.memory_data = self._load_memory()
+        self._rebuild_derived_state()
+
         self.memory_retention = timedelta(days=30)
         self.backup_dir = "memory_backups"
         self.last_backup = None
         self.backup_interval = timedelta(hours=1)
+
+        # Memoize per-message analysis; repeated/echoed messages are common
+        # and the result depends only on the text
+        self._sentiment_cache = {}
+        self._topics_cache = {}
+        self._analysis_cache_size = 4096
+
+        # Coalesce saves: mutators only mark the data dirty and a single
+        # background flusher writes at most one snapshot per second, so a
+        # burst of 50 messages costs one serialization instead of 50
+        self._data_lock = threading.RLock()
+        self._dirty = threading.Event()
+        self._stop_flusher = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop,
+                                         daemon=True)
+        self._flusher.start()
+        atexit.register(self._final_flush)
         
         # Create backup directory if it doesn't exist
         if not os.path.exists(self.backup_dir):
             os.makedirs(self.backup_dir)
+
+        # Rotation state lives in memory: one directory listing at startup,
+        # then a bounded deque instead of listdir+sort on every backup
+        existing = sorted(f for f in os.listdir(self.backup_dir)
+                          if f.endswith('.json'))
+        for stale in existing[:-10]:
+            stale_path = os.path.join(self.backup_dir, stale)
+            os.remove(stale_path)
+            if os.path.exists(stale_path + ".sha"):
+                os.remove(stale_path + ".sha")
+        self._backups = deque(existing[-10:], maxlen=10)
         
         # Auto-backup on initialization
         self._create_backup()
@@ -29,6 +214,34 @@ class MemoryManager:
             self._repair_memory()
             self._create_backup()  # Create backup after repair
 
+    def _rebuild_derived_state(self):
+        """Recompute the in-memory indexes and counters from memory_data
+
+        Every path that replaces memory_data wholesale (load, restores,
+        recovery, clear) must call this; the indexes hold list positions
+        and counts that only make sense for the data they were built from.
+        """
+        # Explicit per-user conversation counters; len() of the stored dict
+        # drifts as old entries are purged, so periodic-backup decisions
+        # key off how many conversations were actually added
+        self._convo_counters = Counter({
+            uid: len(convos)
+            for uid, convos in self.memory_data.get("conversations",
+                                                    {}).items()
+        })
+
+        # Inverted context-word index so phrase lookups don't scan every
+        # stored phrase per message
+        self._phrase_index = self._build_phrase_index()
+
+        # Per-user keyword -> conversation-timestamp index; related-memory
+        # lookups only re-extract keywords from the incoming message
+        self._convo_index = self._build_convo_index()
+
+        # Membership sets shadowing the stored pattern/preference lists so
+        # dedupe checks are O(1); lazily seeded from the list on first use
+        self._seen_values = defaultdict(set)
+
     def _repair_memory(self):
         """Advanced memory repair function"""
         default_memory = self._create_default_memory()
@@ -68,26 +281,35 @@ class MemoryManager:
         backup_path = os.path.join(self.backup_dir, f"bella_memory_backup_{timestamp}.json")
         
         try:
-            # Create new backup
-            with open(self.memory_file, 'r') as source:
-                memory_data = json.load(source)
-                with open(backup_path, 'w') as backup:
-                    json.dump(memory_data, backup, indent=4)
-            
-            # Validate backup
-            with open(backup_path, 'r') as backup:
-                backup_data = json.load(backup)
-                if backup_data != memory_data:
-                    raise ValueError("Backup validation failed")
+            # Create new backup: the atomic save guarantees the source is
+            # always a complete snapshot, so copy its bytes verbatim — no
+            # parse/reserialize cycle just to duplicate a file
+            with open(self.memory_file, 'rb') as source:
+                raw = source.read()
+
+            digest = hashlib.blake2b(raw, digest_size=16).hexdigest()
+            tmp = backup_path + ".tmp"
+            with open(tmp, 'wb') as backup:
+                backup.write(raw)
+                backup.flush()
+                os.fsync(backup.fileno())
+            os.replace(tmp, backup_path)
+
+            # Digest sidecar lets restores verify integrity cheaply
+            with open(backup_path + ".sha", 'w') as sidecar:
+                sidecar.write(digest)
             
             # Update last backup time
             self.last_backup = current_time
             
-            # Rotate backups (keep last 10 instead of 5)
-            backups = sorted([f for f in os.listdir(self.backup_dir) if f.endswith('.json')])
-            if len(backups) > 10:
-                for old_backup in backups[:-10]:
-                    os.remove(os.path.join(self.backup_dir, old_backup))
+            # Rotate backups (keep last 10) using the in-memory deque
+            if len(self._backups) == self._backups.maxlen:
+                old_path = os.path.join(self.backup_dir, self._backups[0])
+                if os.path.exists(old_path):
+                    os.remove(old_path)
+                if os.path.exists(old_path + ".sha"):
+                    os.remove(old_path + ".sha")
+            self._backups.append(os.path.basename(backup_path))
                     
         except Exception as e:
             print(f"Backup creation failed: {str(e)}")
@@ -102,14 +324,28 @@ class MemoryManager:
             for backup_file in backups:
                 backup_path = os.path.join(self.backup_dir, backup_file)
                 try:
-                    with open(backup_path, 'r') as backup:
-                        data = json.load(backup)
-                        # Validate backup structure
-                        if self._validate_memory_structure(data):
-                            self.memory_data = data
-                            self._save_memory()
-                            print(f"Successfully restored from backup: {backup_file}")
-                            return True
+                    with open(backup_path, 'rb') as backup:
+                        raw = backup.read()
+
+                    # Reject backups whose digest sidecar does not match
+                    sidecar_path = backup_path + ".sha"
+                    if os.path.exists(sidecar_path):
+                        with open(sidecar_path) as sidecar:
+                            expected = sidecar.read().strip()
+                        actual = hashlib.blake2b(
+                            raw, digest_size=16).hexdigest()
+                        if actual != expected:
+                            continue
+
+                    data = _json_loads(raw)
+                    # Validate backup structure
+                    if self._validate_memory_structure(data):
+                        self._merge_defaults(data)
+                        self.memory_data = data
+                        self._rebuild_derived_state()
+                        self._save_memory()
+                        print(f"Successfully restored from backup: {backup_file}")
+                        return True
                 except:
                     continue
                     
@@ -122,88 +358,23 @@ class MemoryManager:
 
     def _validate_memory_structure(self, data: Dict) -> bool:
         """Validate memory structure against required schema"""
-        required_keys = {
-            "users": dict,
-            "conversations": dict,
-            "instructions": dict,
-            "behavior_notes": list,
-            "owner_commands": dict,
-            "punishment_rules": dict,
-            "behavior_rules": dict,
-            "emotional_states": list,
-            "analytics": dict,
-            "user_reputation": dict,
-            "conversation_summaries": dict,
-            "backups": list,
-            "memorable_phrases": list,
-            "message_patterns": dict,
-            "conversation_styles": dict,
-            "user_preferences": dict,
-            "interaction_metrics": dict,
-            "relationships": dict,
-            "user_notes": dict,
-            "media_interactions": dict
-        }
-
         try:
-            for key, expected_type in required_keys.items():
-                if key not in data:
-                    return False
-                if not isinstance(data[key], expected_type):
-                    return False
-            return True
+            return all(
+                isinstance(data.get(key), expected_type)
+                for key, expected_type in _REQUIRED_MEMORY_KEYS.items())
         except:
             return False
 
-    def add_conversation(self, user_id: str, message: str, response: str, is_owner: bool = False):
-        """Enhanced conversation tracking with analytics"""
-        if "conversations" not in self.memory_data:
-            self.memory_data["conversations"] = {}
-            
-        if user_id not in self.memory_data["conversations"]:
-            self.memory_data["conversations"][user_id] = {}
-            
-        timestamp = datetime.now().isoformat()
-        
-        # Enhanced context tracking
-        context = {
-            "timestamp": timestamp,
-            "message_type": "owner_message" if is_owner else "user_message",
-            "sentiment": self._analyze_sentiment(message),
-            "topics": self._extract_topics(message),
-            "language": detect(message),
-            "message_length": len(message),
-            "response_length": len(response),
-            "interaction_time": timestamp
-        }
-        
-        # Store conversation with enhanced metadata
-        self.memory_data["conversations"][user_id][timestamp] = {
-            "message": message,
-            "response": response,
-            "is_owner": is_owner,
-            "context": context
-        }
-        
-        # Update analytics
-        self._update_analytics(user_id, context)
-        
-        # Auto-backup on significant changes
-        if len(self.memory_data["conversations"][user_id]) % 10 == 0:
-            self._create_backup()
-            
-        self._save_memory()
-
     def _analyze_sentiment(self, text: str) -> str:
         """Basic sentiment analysis"""
-        positive_words = {'love', 'great', 'awesome', 'amazing', 'good', 'thanks', 'please'}
-        negative_words = {'hate', 'bad', 'stupid', 'dumb', 'idiot', 'fuck', 'shit'}
-        
-        text_words = set(text.lower().split())
-        
-        pos_count = len(text_words.intersection(positive_words))
-        neg_count = len(text_words.intersection(negative_words))
-        
+        # Single pass over the words; no per-message set allocations
+        pos_count = neg_count = 0
+        for word in text.lower().split():
+            if word in _POSITIVE_WORDS:
+                pos_count += 1
+            elif word in _NEGATIVE_WORDS:
+                neg_count += 1
+
         if pos_count > neg_count:
             return "very_positive" if pos_count > 2 else "positive"
         elif neg_count > pos_count:
@@ -211,60 +382,60 @@ class MemoryManager:
         return "neutral"
 
     def _extract_topics(self, text: str) -> List[str]:
-        """Extract main topics from text"""
-        # Add your topic extraction logic here
-        # This is a simple example
-        common_topics = {
-            'greeting': ['hi', 'hello', 'hey'],
-            'farewell': ['bye', 'goodbye', 'cya'],
-            'help': ['help', 'assist', 'support'],
-            'command': ['!', '/', 'command'],
-            'emotion': ['feel', 'happy', 'sad', 'angry']
-        }
-        
-        found_topics = []
-        text_lower = text.lower()
-        
-        for topic, keywords in common_topics.items():
-            if any(keyword in text_lower for keyword in keywords):
-                found_topics.append(topic)
-                
-        return found_topics
+        """Extract main topics from text (memoized on the raw text)"""
+        cached = self._topics_cache.get(text)
+        if cached is None:
+            cached = self._find_topics(text)
+            if len(self._topics_cache) >= self._analysis_cache_size:
+                self._topics_cache.clear()
+            self._topics_cache[text] = cached
+        return list(cached)
+
+    @staticmethod
+    def _find_topics(text: str) -> List[str]:
+        """Scan text for known topic keywords"""
+        return [
+            topic for topic, pattern in _TOPIC_PATTERNS.items()
+            if pattern.search(text)
+        ]
 
-    def _update_analytics(self, user_id: str, context: Dict):
+    def _update_analytics(self, user_id: str, context: Dict,
+                          now: datetime = None):
         """Update analytics with new interaction data"""
-        if "analytics" not in self.memory_data:
-            self.memory_data["analytics"] = {
-                "user_engagement": {},
-                "command_usage": {},
-                "response_metrics": {},
-                "error_logs": [],
-                "performance_metrics": {}
-            }
-            
-        # Update user engagement
-        if user_id not in self.memory_data["analytics"]["user_engagement"]:
-            self.memory_data["analytics"]["user_engagement"][user_id] = {
+        # Update user engagement; top-level structure is guaranteed at load
+        engagement_table = self.memory_data["analytics"]["user_engagement"]
+        if user_id not in engagement_table:
+            engagement_table[user_id] = {
                 "total_messages": 0,
-                "avg_message_length": 0,
+                "total_message_length": 0,
                 "sentiment_distribution": {
                     "positive": 0,
                     "negative": 0,
                     "neutral": 0
                 },
-                "active_hours": {},
-                "topics_discussed": {}
+                "active_hours": Counter(),
+                "topics_discussed": Counter()
             }
-            
-        engagement = self.memory_data["analytics"]["user_engagement"][user_id]
+
+        engagement = engagement_table[user_id]
         engagement["total_messages"] += 1
-        
-        # Update average message length
-        engagement["avg_message_length"] = (
-            (engagement["avg_message_length"] * (engagement["total_messages"] - 1) +
-             context["message_length"]) / engagement["total_messages"]
-        )
-        
+
+        # Counters increment with one lookup; entries loaded from disk come
+        # back as plain dicts, so upgrade them in place on first touch
+        if not isinstance(engagement["active_hours"], Counter):
+            engagement["active_hours"] = Counter(engagement["active_hours"])
+            engagement["topics_discussed"] = Counter(
+                engagement["topics_discussed"])
+
+        # Track the running sum; the average is computed on demand, which
+        # avoids a float divide per message and any FP drift. Records from
+        # before this change carry avg_message_length instead — convert.
+        if "total_message_length" not in engagement:
+            legacy_avg = engagement.pop("avg_message_length", 0)
+            engagement["total_message_length"] = int(
+                legacy_avg * (engagement["total_messages"] - 1))
+        engagement["total_message_length"] += context["message_length"]
+
         # Update sentiment distribution
         sentiment = context["sentiment"]
         if "positive" in sentiment:
@@ -273,36 +444,48 @@ class MemoryManager:
             engagement["sentiment_distribution"]["negative"] += 1
         else:
             engagement["sentiment_distribution"]["neutral"] += 1
-            
+
         # Update active hours
-        hour = datetime.fromisoformat(context["timestamp"]).hour
-        engagement["active_hours"][str(hour)] = engagement["active_hours"].get(str(hour), 0) + 1
-        
+        # Callers that still hold the datetime pass it in, saving an
+        # isoformat round-trip
+        hour = (now or _parse_iso(context["timestamp"])).hour
+        engagement["active_hours"][str(hour)] += 1
+
         # Update topics
         for topic in context["topics"]:
-            engagement["topics_discussed"][topic] = engagement["topics_discussed"].get(topic, 0) + 1
+            engagement["topics_discussed"][topic] += 1
 
     def _load_memory(self) -> Dict:
         """Enhanced memory loading with corruption handling"""
         try:
             # Try to load the main memory file
-            with open(self.memory_file, 'r') as f:
-                data = json.load(f)
-                
+            with open(self.memory_file, 'rb') as f:
+                data = _json_loads(f.read())
+
             # Initialize missing keys instead of replacing everything
-            default_memory = self._create_default_memory()
-            
-            # Merge existing data with default structure
-            for key in default_memory:
-                if key not in data:
-                    data[key] = default_memory[key]
-            
+            self._merge_defaults(data)
+
+            # Re-apply anything journaled since the last snapshot
+            self._replay_journal(data)
+
             return data
-                
-        except (FileNotFoundError, json.JSONDecodeError) as e:
+
+        # orjson and stdlib json both raise ValueError subclasses on bad input
+        except (FileNotFoundError, ValueError) as e:
             print(f"Memory load failed: {str(e)}, creating new memory file")
             return self._create_default_memory()
 
+    def _merge_defaults(self, data: Dict):
+        """Fill any missing top-level keys with their defaults
+
+        Every load/restore path runs this, so mutators can rely on the
+        full schema being present instead of re-checking per call.
+        """
+        default_memory = self._create_default_memory()
+        for key in default_memory:
+            if key not in data:
+                data[key] = default_memory[key]
+
     def _create_default_memory(self) -> Dict:
         """Create default memory structure"""
         return {
@@ -330,6 +513,10 @@ class MemoryManager:
             "memorable_phrases": [],
             "message_patterns": {},
             "conversation_styles": {},
+            "user_preferences": {},
+            "interaction_metrics": {},
+            "relationships": {},
+            "user_notes": {},
             "last_cleaned": datetime.now().isoformat(),
             "media_interactions": {
                 "images": {},
@@ -339,24 +526,101 @@ class MemoryManager:
         }
 
     def _save_memory(self):
-        """Enhanced save with error handling"""
+        """Atomic snapshot: write a temp file, then os.replace into place"""
         try:
-            # Create backup of current file if it exists
-            if os.path.exists(self.memory_file):
-                backup_file = f"{self.memory_file}.bak"
-                with open(self.memory_file, 'r') as source:
-                    with open(backup_file, 'w') as backup:
-                        backup.write(source.read())
-            
-            # Save new data
-            with open(self.memory_file, 'w') as f:
-                json.dump(self.memory_data, f, indent=4)
-                
+            # One lock spans serialize -> write -> replace -> journal
+            # reset: the flusher and mutator threads share the tmp path
+            # and the journal handle, and an unlocked interleaving can
+            # publish a truncated snapshot
+            with self._data_lock:
+                raw = _json_dumps(self.memory_data)
+                tmp = self.memory_file + ".tmp"
+                with open(tmp, 'wb', buffering=1 << 20) as f:
+                    f.write(raw)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+                # Atomic on POSIX and Windows; a crash mid-save leaves the
+                # old snapshot intact, so no pre-save .bak copy is needed
+                os.replace(tmp, self.memory_file)
+
+                # The snapshot now contains everything the journal recorded
+                self._reset_journal()
+
         except Exception as e:
             print(f"Memory save failed: {str(e)}")
-            # If save failed and backup exists, restore from backup
-            if os.path.exists(f"{self.memory_file}.bak"):
-                os.replace(f"{self.memory_file}.bak", self.memory_file)
+
+    def _mark_dirty(self):
+        """Record that memory changed; the flusher persists it shortly"""
+        self._dirty.set()
+
+    def _flush_loop(self):
+        """Background writeback: coalesce dirty marks into one save"""
+        while not self._stop_flusher.is_set():
+            if self._dirty.wait(timeout=1.0):
+                self._dirty.clear()
+                self._save_memory()
+
+    def _final_flush(self):
+        """Flush any pending changes on interpreter shutdown"""
+        self._stop_flusher.set()
+        if self._dirty.is_set():
+            self._dirty.clear()
+            self._save_memory()
+
+    def _append_journal(self, record: Dict):
+        """Append one event to the journal instead of rewriting everything"""
+        try:
+            # Same lock as _save_memory: _reset_journal closes the handle
+            # from the flusher thread, so appends must not race it
+            with self._data_lock:
+                if self._journal_fh is None:
+                    self._journal_fh = open(self.journal_file, 'ab',
+                                            buffering=1 << 16)
+                self._journal_fh.write(_json_dumps(record) + b"\n")
+                self._journal_fh.flush()
+                self._events_since_snapshot += 1
+                self._maybe_snapshot()
+        except Exception as e:
+            print(f"Journal append failed: {str(e)}")
+            self._save_memory()
+
+    def _maybe_snapshot(self):
+        """Write a full snapshot once enough events or time accumulated"""
+        if (self._events_since_snapshot >= self.snapshot_max_events
+                or time.monotonic() - self._last_snapshot
+                >= self.snapshot_max_age):
+            self._save_memory()
+
+    def _reset_journal(self):
+        """Discard the journal after a successful full snapshot"""
+        if self._journal_fh is not None:
+            self._journal_fh.close()
+            self._journal_fh = None
+        if os.path.exists(self.journal_file):
+            os.remove(self.journal_file)
+        self._events_since_snapshot = 0
+        self._last_snapshot = time.monotonic()
+
+    def _replay_journal(self, data: Dict):
+        """Apply journaled conversations on top of the last snapshot
+
+        Derived state (analytics, patterns) is rebuilt from later traffic;
+        only the raw conversations need to survive a crash.
+        """
+        if not os.path.exists(self.journal_file):
+            return
+        try:
+            with open(self.journal_file, 'rb') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = _json_loads(line)
+                    if record.get("t") == "convo":
+                        data.setdefault("conversations", {}).setdefault(
+                            record["uid"], {})[record["ts"]] = record["entry"]
+        except Exception as e:
+            print(f"Journal replay failed: {str(e)}")
 
     def _recover_from_backup(self):
         """Recover memory from most recent backup"""
@@ -364,8 +628,10 @@ class MemoryManager:
             backups = sorted([f for f in os.listdir(self.backup_dir) if f.endswith('.json')])
             if backups:
                 latest_backup = os.path.join(self.backup_dir, backups[-1])
-                with open(latest_backup, 'r') as f:
-                    self.memory_data = json.load(f)
+                with open(latest_backup, 'rb') as f:
+                    self.memory_data = _json_loads(f.read())
+                self._merge_defaults(self.memory_data)
+                self._rebuild_derived_state()
                 print("Successfully recovered from backup")
             else:
                 print("No backups available for recovery")
@@ -377,17 +643,20 @@ class MemoryManager:
         last_cleaned = self.memory_data.get("last_cleaned")
 
         if last_cleaned and (current_time -
-                             datetime.fromisoformat(last_cleaned)).days < 1:
+                             _parse_iso(last_cleaned)).days < 1:
             return  # Only clean once per day
 
+        # Retention is a pure range query; comparing ISO strings against
+        # one precomputed cutoff avoids parsing every stored timestamp
+        cutoff_iso = (current_time - self.memory_retention).isoformat()
+
         for user_id in list(self.memory_data["conversations"].keys()):
             conversations = self.memory_data["conversations"][user_id]
-            recent_convos = {}
-
-            for timestamp, convo in conversations.items():
-                if (current_time - datetime.fromisoformat(timestamp)
-                    ) <= self.memory_retention:
-                    recent_convos[timestamp] = convo
+            recent_convos = {
+                timestamp: convo
+                for timestamp, convo in conversations.items()
+                if timestamp >= cutoff_iso
+            }
 
             if recent_convos:
                 self.memory_data["conversations"][user_id] = recent_convos
@@ -395,18 +664,16 @@ class MemoryManager:
                 del self.memory_data["conversations"][user_id]
 
         self.memory_data["last_cleaned"] = current_time.isoformat()
-        self._save_memory()
+        self._mark_dirty()
 
     def add_user_info(self, user_id: str, info: Dict):
         """Store or update user information"""
-        if "users" not in self.memory_data:
-            self.memory_data["users"] = {}
-            
+        now_iso = datetime.now().isoformat()
         if user_id not in self.memory_data["users"]:
             self.memory_data["users"][user_id] = {
                 "name": None,
-                "first_seen": datetime.now().isoformat(),
-                "last_seen": datetime.now().isoformat(),
+                "first_seen": now_iso,
+                "last_seen": now_iso,
                 "preferences": {},
                 "traits": [],
                 "personal_info": {},
@@ -414,9 +681,9 @@ class MemoryManager:
                 "remembered_facts": [],
                 "conversation_style": "default"
             }
-        
+
         user_data = self.memory_data["users"][user_id]
-        user_data["last_seen"] = datetime.now().isoformat()
+        user_data["last_seen"] = now_iso
         
         # Update specific fields while preserving existing data
         if "name" in info:
@@ -428,56 +695,88 @@ class MemoryManager:
             if info["fact"] not in user_data["remembered_facts"]:
                 user_data["remembered_facts"].append({
                     "fact": info["fact"],
-                    "timestamp": datetime.now().isoformat()
+                    "timestamp": now_iso
                 })
                 
         if "preference" in info:
             user_data["preferences"][info["preference"]["type"]] = info["preference"]["value"]
             
-        self._save_memory()
-
-    def add_conversation(self, user_id: str, message: str, response: str, is_owner: bool):
-        """Enhanced conversation storage with detailed memory"""
-        if "conversations" not in self.memory_data:
-            self.memory_data["conversations"] = {}
-
-        if user_id not in self.memory_data["conversations"]:
-            self.memory_data["conversations"][user_id] = {}
-
-        timestamp = datetime.now().isoformat()
-        
-        # Enhanced context tracking with more details
+        self._mark_dirty()
+
+    def add_conversation(self, user_id: str, message: str, response: str,
+                         is_owner: bool, timestamp: str = None):
+        """Enhanced conversation storage with detailed memory
+
+        Callers that already stamped the surrounding event can pass that
+        timestamp in so related records stay consistent.
+        """
+        # The same user id arrives as a fresh string on every message;
+        # interning collapses the copies held across conversations,
+        # counters and indexes to one object
+        user_id = sys.intern(user_id)
+
+        # Top-level keys are guaranteed by _load_memory/_repair_memory
+        user_convos = self.memory_data["conversations"].setdefault(
+            user_id, {})
+
+        now = datetime.now()
+        if timestamp is None:
+            timestamp = now.isoformat()
+        
+        # Enhanced context tracking with more details; the analyzers run
+        # as one fused pass over the message
+        analysis = self._analyze_message(message)
         context = {
             "timestamp": timestamp,
-            "message_type": self._determine_message_type(message),
-            "sentiment": self._analyze_sentiment(message),
-            "language": detect(message) if message else "unknown",
+            "message_type": analysis["message_type"],
+            "sentiment": analysis["sentiment"],
+            "language": _detect_lang(message) if len(message) >= 4 else "unknown",
             "user_state": self._get_user_state(user_id),
             "conversation_chain": self._get_conversation_chain(user_id),
             "active_rules": self._get_active_rules(user_id),
             "environmental_context": {
-                "time_of_day": datetime.now().strftime("%H:%M"),
-                "day_of_week": datetime.now().strftime("%A"),
+                "time_of_day": now.strftime("%H:%M"),
+                "day_of_week": now.strftime("%A"),
                 "server_load": self._get_server_load()
             },
-            "keywords": self._extract_keywords(message),
-            "topics": self._identify_topics(message),
+            "keywords": analysis["keywords"],
+            "topics": analysis["topics"],
             "references": self._find_references(message),
-            "emotional_context": self._get_emotional_context()
+            "emotional_context": self._get_emotional_context(),
+            "message_length": len(message),
+            "response_length": len(response)
         }
         
-        self.memory_data["conversations"][user_id][timestamp] = {
+        user_convos[timestamp] = {
             "message": message,
             "response": response,
             "is_owner": is_owner,
             "context": context,
-            "related_memories": self._find_related_memories(message, user_id),
-            "instruction_references": self._find_relevant_instructions(message)
+            "related_memories": self._find_related_memories(
+                message, user_id, keywords=analysis["keywords"]),
+            "instruction_references": self._find_relevant_instructions(
+                message, keywords=analysis["keywords"])
         }
+        self._index_conversation(user_id, timestamp, analysis["keywords"])
 
         # Process and store detailed patterns
         self._process_conversation_patterns(user_id, message, context)
-        self._save_memory()
+
+        # Update analytics
+        self._update_analytics(user_id, context, now)
+
+        # Periodic backup driven by the monotonic per-user counter
+        self._convo_counters[user_id] += 1
+        if self._convo_counters[user_id] % 10 == 0:
+            self._create_backup()
+
+        # Journal the event; a full snapshot is written only periodically
+        self._append_journal({
+            "t": "convo",
+            "uid": user_id,
+            "ts": timestamp,
+            "entry": user_convos[timestamp]
+        })
 
     def get_recent_conversations(self,
                                  user_id: str,
@@ -487,22 +786,21 @@ class MemoryManager:
             return []
 
         conversations = self.memory_data["conversations"][user_id]
-        sorted_convos = sorted([{
-            "timestamp": ts,
-            **conv
-        } for ts, conv in conversations.items()],
-                               key=lambda x: x["timestamp"],
-                               reverse=True)
 
-        return sorted_convos[:limit]
+        # ISO timestamps sort lexicographically; nlargest is O(N log limit)
+        # instead of sorting the user's entire history per lookup
+        recent = heapq.nlargest(limit, conversations.items(),
+                                key=lambda kv: kv[0])
+        return [{"timestamp": ts, **conv} for ts, conv in recent]
 
     def get_user_info(self, user_id: str) -> Dict:
         """Get comprehensive user information"""
         if user_id not in self.memory_data["users"]:
+            now_iso = datetime.now().isoformat()
             self.memory_data["users"][user_id] = {
                 "name": None,
-                "first_seen": datetime.now().isoformat(),
-                "last_seen": datetime.now().isoformat(),
+                "first_seen": now_iso,
+                "last_seen": now_iso,
                 "preferences": {},
                 "traits": [],
                 "personal_info": {
@@ -543,7 +841,7 @@ class MemoryManager:
         if recent_convos:
             summary.append("\n💬 Recent Interactions:")
             for convo in recent_convos:
-                timestamp = datetime.fromisoformat(convo["timestamp"]).strftime("%Y-%m-%d %H:%M")
+                timestamp = _parse_iso(convo["timestamp"]).strftime("%Y-%m-%d %H:%M")
                 context = convo.get("context", {})
                 summary.append(f"[{timestamp}] ({context.get('message_type', 'conversation')})")
                 summary.append(f"User: {convo['message']}")
@@ -556,13 +854,10 @@ class MemoryManager:
 
     def get_punishment_history(self, user_id: str) -> str:
         """Get user's punishment history"""
-        if "punishment_rules" not in self.memory_data:
-            return ""
-
         history = []
         for rule_id, rule in self.memory_data["punishment_rules"].items():
             if rule_id == user_id:
-                timestamp = datetime.fromisoformat(rule["timestamp"]).strftime("%Y-%m-%d %H:%M")
+                timestamp = _parse_iso(rule["timestamp"]).strftime("%Y-%m-%d %H:%M")
                 punishment_type = rule["type"]
                 duration = f" for {rule['duration']} minutes" if rule.get("duration") else ""
                 status = "Active" if rule.get("active", True) else "Inactive"
@@ -575,12 +870,10 @@ class MemoryManager:
         summary = []
         for user_id, conversations in self.memory_data.get(
                 "conversations", {}).items():
-            # Get the most recent conversation
-            sorted_convos = sorted(conversations.items(),
-                                   key=lambda x: x[0],
-                                   reverse=True)
-            if sorted_convos:
-                latest_convo = sorted_convos[0][1]
+            # Get the most recent conversation without sorting the rest
+            if conversations:
+                latest_convo = max(conversations.items(),
+                                   key=lambda kv: kv[0])[1]
                 is_owner = latest_convo.get("is_owner", False)
                 user_type = "👤 Regular user" if is_owner else "👤 Regular user"
                 summary.append(f"User {user_id} ({user_type}):")
@@ -600,9 +893,8 @@ class MemoryManager:
 
         # Count message characteristics
         total_msgs = len(conversations)
-        polite_count = sum(1 for conv in conversations if any(
-            word in conv['message'].lower()
-            for word in ['please', 'thank', 'thanks', 'kind']))
+        polite_count = sum(1 for conv in conversations
+                           if _POLITE_RE.search(conv['message']))
         question_count = sum(1 for conv in conversations
                              if '?' in conv['message'])
 
@@ -619,12 +911,9 @@ class MemoryManager:
 
     def add_instruction(self, user_id: str, instruction: str, is_permanent: bool = True):
         """Store user instructions with context"""
-        if "instructions" not in self.memory_data:
-            self.memory_data["instructions"] = {}
-            
-        if user_id not in self.memory_data["instructions"]:
-            self.memory_data["instructions"][user_id] = []
-            
+        user_instructions = self.memory_data["instructions"].setdefault(
+            user_id, [])
+
         instruction_data = {
             "instruction": instruction,
             "timestamp": datetime.now().isoformat(),
@@ -638,38 +927,34 @@ class MemoryManager:
             }
         }
         
-        self.memory_data["instructions"][user_id].append(instruction_data)
-        self._save_memory()
+        user_instructions.append(instruction_data)
+        self._mark_dirty()
 
     def add_behavior_note(self, note: str):
         """Store general behavior notes and personality traits"""
-        if "behavior_notes" not in self.memory_data:
-            self.memory_data["behavior_notes"] = []
-
         timestamp = datetime.now().isoformat()
         self.memory_data["behavior_notes"].append({
             "timestamp": timestamp,
             "note": note
         })
-        self._save_memory()
+        self._mark_dirty()
 
     def get_important_instructions(self, user_id: str = None) -> str:
         """Get summary of important instructions, optionally filtered by user"""
-        if "instructions" not in self.memory_data:
+        instructions = self.memory_data["instructions"]
+        if not instructions:
             return "No stored instructions."
 
         summary = []
-        instructions = self.memory_data["instructions"]
 
         if user_id:
             if user_id not in instructions:
                 return "No instructions from this user."
             user_instructions = instructions[user_id]
             summary.append(f"Instructions from user {user_id}:")
-            for inst in sorted(user_instructions,
-                               key=lambda x: x["timestamp"],
-                               reverse=True)[:5]:
-                timestamp = datetime.fromisoformat(
+            for inst in heapq.nlargest(5, user_instructions,
+                                       key=lambda x: x["timestamp"]):
+                timestamp = _parse_iso(
                     inst["timestamp"]).strftime("%Y-%m-%d")
                 summary.append(
                     f"[{timestamp}] {'👑 ' if inst['is_owner'] else ''}Instruction: {inst['instruction']}"
@@ -681,12 +966,11 @@ class MemoryManager:
                 for inst in user_instructions:
                     all_instructions.append((uid, inst))
 
-            sorted_instructions = sorted(all_instructions,
-                                         key=lambda x: x[1]["timestamp"],
-                                         reverse=True)[:10]
+            sorted_instructions = heapq.nlargest(
+                10, all_instructions, key=lambda x: x[1]["timestamp"])
 
             for uid, inst in sorted_instructions:
-                timestamp = datetime.fromisoformat(
+                timestamp = _parse_iso(
                     inst["timestamp"]).strftime("%Y-%m-%d")
                 user_type = " Owner" if inst["is_owner"] else "User"
                 summary.append(
@@ -697,17 +981,16 @@ class MemoryManager:
 
     def get_behavior_summary(self) -> str:
         """Get summary of Bella's learned behaviors and personality traits"""
-        if "behavior_notes" not in self.memory_data:
+        notes = self.memory_data["behavior_notes"]
+        if not notes:
             return "No behavior notes stored."
 
-        notes = self.memory_data["behavior_notes"]
-        recent_notes = sorted(notes,
-                              key=lambda x: x["timestamp"],
-                              reverse=True)[:5]
+        recent_notes = heapq.nlargest(5, notes,
+                                      key=lambda x: x["timestamp"])
 
         summary = ["Recent behavior notes:"]
         for note in recent_notes:
-            timestamp = datetime.fromisoformat(
+            timestamp = _parse_iso(
                 note["timestamp"]).strftime("%Y-%m-%d")
             summary.append(f"[{timestamp}] {note['note']}")
 
@@ -715,12 +998,6 @@ class MemoryManager:
 
     def add_owner_command(self, command: str, permanent: bool = True):
         """Store permanent commands from the owner"""
-        if "owner_commands" not in self.memory_data:
-            self.memory_data["owner_commands"] = {
-                "permanent": [],
-                "temporary": []
-            }
-
         timestamp = datetime.now().isoformat()
         command_data = {
             "timestamp": timestamp,
@@ -735,13 +1012,10 @@ class MemoryManager:
             self.memory_data["owner_commands"]["temporary"].append(
                 command_data)
 
-        self._save_memory()
+        self._mark_dirty()
 
     def get_active_owner_commands(self) -> str:
         """Get all active commands from the owner"""
-        if "owner_commands" not in self.memory_data:
-            return "No owner commands stored."
-
         summary = []
 
         # Get permanent commands
@@ -750,7 +1024,7 @@ class MemoryManager:
             summary.append("🔒 Permanent Commands:")
             for cmd in permanent:
                 if cmd.get("active", True):
-                    timestamp = datetime.fromisoformat(
+                    timestamp = _parse_iso(
                         cmd["timestamp"]).strftime("%Y-%m-%d")
                     summary.append(f"[{timestamp}] {cmd['command']}")
 
@@ -762,7 +1036,7 @@ class MemoryManager:
             summary.append("⏳ Temporary Commands:")
             for cmd in temporary:
                 if cmd.get("active", True):
-                    timestamp = datetime.fromisoformat(
+                    timestamp = _parse_iso(
                         cmd["timestamp"]).strftime("%Y-%m-%d")
                     summary.append(f"[{timestamp}] {cmd['command']}")
 
@@ -773,9 +1047,6 @@ class MemoryManager:
                             punishment_type: str,
                             duration: int = None):
         """Store permanent punishment rules set by owner"""
-        if "punishment_rules" not in self.memory_data:
-            self.memory_data["punishment_rules"] = {}
-
         timestamp = datetime.now().isoformat()
         self.memory_data["punishment_rules"][target_id] = {
             "timestamp": timestamp,
@@ -783,13 +1054,10 @@ class MemoryManager:
             "duration": duration,  # in minutes for timeout, None for ban/kick
             "active": True
         }
-        self._save_memory()
+        self._mark_dirty()
 
     def get_punishment_rule(self, user_id: str) -> Optional[Dict]:
         """Get active punishment rule for a user if it exists"""
-        if "punishment_rules" not in self.memory_data:
-            return None
-
         rule = self.memory_data["punishment_rules"].get(user_id)
         if rule and rule.get("active", True):
             return rule
@@ -800,13 +1068,10 @@ class MemoryManager:
         if "punishment_rules" in self.memory_data:
             if user_id in self.memory_data["punishment_rules"]:
                 del self.memory_data["punishment_rules"][user_id]
-                self._save_memory()
+                self._mark_dirty()
 
     def get_active_punishments_summary(self) -> str:
         """Get summary of all active punishments"""
-        if "punishment_rules" not in self.memory_data:
-            return "No active punishments."
-
         summary = []
         for user_id, rule in self.memory_data["punishment_rules"].items():
             if rule.get("active", True):
@@ -819,9 +1084,6 @@ class MemoryManager:
 
     def add_behavior_rule(self, target_id: str, behavior: str, is_owner_command: bool = True):
         """Store behavior rules for specific users with treatment types"""
-        if "behavior_rules" not in self.memory_data:
-            self.memory_data["behavior_rules"] = {}
-
         timestamp = datetime.now().isoformat()
         if target_id not in self.memory_data["behavior_rules"]:
             self.memory_data["behavior_rules"][target_id] = []
@@ -846,13 +1108,18 @@ class MemoryManager:
             "is_owner_command": is_owner_command,
             "active": True
         })
-        self._save_memory()
+
+        # Denormalized latest-rule pointer so the per-message lookup in
+        # get_user_behavior_type is a single dict access
+        self.memory_data.setdefault("behavior_rules_latest", {})[target_id] = {
+            "behavior_type": behavior_type,
+            "behavior": behavior,
+            "timestamp": timestamp
+        }
+        self._mark_dirty()
 
     def get_user_behavior_rules(self, user_id: str) -> str:
         """Get active behavior rules for a specific user"""
-        if "behavior_rules" not in self.memory_data:
-            return "No behavior rules."
-
         rules = self.memory_data["behavior_rules"].get(user_id, [])
         active_rules = [rule for rule in rules if rule.get("active", True)]
 
@@ -863,34 +1130,25 @@ class MemoryManager:
 
     def get_user_behavior_type(self, user_id: str) -> str:
         """Get the current behavior type for a user"""
-        if "behavior_rules" not in self.memory_data:
-            return "neutral"
-
-        rules = self.memory_data["behavior_rules"].get(user_id, [])
-        active_rules = [rule for rule in rules if rule.get("active", True)]
-        
-        if not active_rules:
-            return "neutral"
-        
-        # Get most recent active rule
-        latest_rule = max(active_rules, key=lambda x: x["timestamp"])
-        return latest_rule.get("behavior_type", "neutral")
+        # Fast path: the latest-rule pointer maintained by add_behavior_rule
+        latest = self.memory_data.get("behavior_rules_latest",
+                                      {}).get(user_id)
+        if latest:
+            return latest.get("behavior_type", "neutral")
+
+        # Fall back for rules recorded before the pointer existed. Rules
+        # are appended in chronological order, so walk back from the end
+        # and stop at the first active one instead of filtering them all
+        rules = self.memory_data.get("behavior_rules", {}).get(user_id, [])
+        for rule in reversed(rules):
+            if rule.get("active", True):
+                return rule.get("behavior_type", "neutral")
+        return "neutral"
 
     def clear_all_memory(self):
         """Clear all stored memory and reset to initial state"""
-        self.memory_data = {
-            "users": {},
-            "conversations": {},
-            "instructions": {},
-            "behavior_notes": [],
-            "owner_commands": {
-                "permanent": [],
-                "temporary": []
-            },
-            "punishment_rules": {},
-            "behavior_rules": {},
-            "last_cleaned": datetime.now().isoformat()
-        }
+        self.memory_data = self._create_default_memory()
+        self._rebuild_derived_state()
         self._save_memory()
 
     def add_analytics_data(self):
@@ -906,9 +1164,6 @@ class MemoryManager:
 
     def manage_user_reputation(self, user_id: str, action: str, value: int = 1):
         """Track user reputation based on interactions"""
-        if "user_reputation" not in self.memory_data:
-            self.memory_data["user_reputation"] = {}
-        
         if user_id not in self.memory_data["user_reputation"]:
             self.memory_data["user_reputation"][user_id] = {
                 "score": 0,
@@ -930,32 +1185,37 @@ class MemoryManager:
             "action": action,
             "value": value
         })
-        
-        self._save_memory()
+        if len(user_rep["history"]) > _REPUTATION_HISTORY_MAX:
+            del user_rep["history"][:-_REPUTATION_HISTORY_MAX]
+
+        self._mark_dirty()
 
     def create_backup(self):
-        """Create timestamped backup of memory"""
+        """Create timestamped gzip backup of memory"""
         backup_time = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_file = f"backup_{backup_time}_bella_memory.json"
-        
-        with open(backup_file, 'w') as f:
-            json.dump(self.memory_data, f, indent=4)
-        
-        # Keep track of backups
-        if "backups" not in self.memory_data:
-            self.memory_data["backups"] = []
-        
+        backup_file = f"backup_{backup_time}_bella_memory.json.gz"
+
+        # Snapshot first so the on-disk file is current, then compress the
+        # already-serialized bytes instead of re-encoding the whole dict
+        self._save_memory()
+        with open(self.memory_file, 'rb') as src:
+            with gzip.open(backup_file, 'wb') as dst:
+                dst.write(src.read())
+
         self.memory_data["backups"].append({
             "timestamp": datetime.now().isoformat(),
             "filename": backup_file
         })
-        self._save_memory()
+        self._mark_dirty()
 
     def restore_from_backup(self, backup_file: str):
         """Restore memory from backup"""
         try:
-            with open(backup_file, 'r') as f:
-                self.memory_data = json.load(f)
+            opener = gzip.open if backup_file.endswith('.gz') else open
+            with opener(backup_file, 'rb') as f:
+                self.memory_data = _json_loads(f.read())
+            self._merge_defaults(self.memory_data)
+            self._rebuild_derived_state()
             self._save_memory()
             return True
         except Exception as e:
@@ -967,30 +1227,30 @@ class MemoryManager:
         for user_id in self.memory_data["conversations"]:
             conversations = self.memory_data["conversations"][user_id]
             if len(conversations) > 100:  # Threshold for optimization
-                # Summarize old conversations
-                old_convos = dict(sorted(conversations.items())[:50])  # Get oldest 50
+                # One sort, then slice: oldest 50 get summarized, rest kept
+                items = sorted(conversations.items())
+                old_items = items[:50]
+                old_convos = dict(old_items)
                 summary = self._generate_conversation_summary(old_convos)
-                
+
                 # Replace old conversations with summary
-                new_convos = dict(sorted(conversations.items())[50:])  # Keep newest 50
-                self.memory_data["conversations"][user_id] = new_convos
+                self.memory_data["conversations"][user_id] = dict(items[50:])
                 
                 # Store summary
-                if "conversation_summaries" not in self.memory_data:
-                    self.memory_data["conversation_summaries"] = {}
-                if user_id not in self.memory_data["conversation_summaries"]:
-                    self.memory_data["conversation_summaries"][user_id] = []
-                
-                self.memory_data["conversation_summaries"][user_id].append({
-                    "period": f"{min(old_convos.keys())} to {max(old_convos.keys())}",
+                self.memory_data["conversation_summaries"].setdefault(
+                    user_id, []).append({
+                    "period": f"{old_items[0][0]} to {old_items[-1][0]}",
                     "summary": summary
                 })
 
+                # Drop the summarized conversations' stale index postings
+                self._convo_index.pop(user_id, None)
+                for timestamp, convo in items[50:]:
+                    self._index_conversation(user_id, timestamp,
+                                             self._stored_keywords(convo))
+
     def add_emotional_state(self, emotion: str, intensity: int, thought: str):
         """Track Bella's emotional state and unfiltered thoughts"""
-        if "emotional_states" not in self.memory_data:
-            self.memory_data["emotional_states"] = []
-            
         timestamp = datetime.now().isoformat()
         self.memory_data["emotional_states"].append({
             "timestamp": timestamp,
@@ -999,14 +1259,26 @@ class MemoryManager:
             "raw_thought": thought,    # Unfiltered thought
             "is_expressed": False      # Track if this thought was expressed
         })
-        self._save_memory()
+        states = self.memory_data["emotional_states"]
+        if len(states) > _EMOTIONAL_STATES_MAX:
+            self._archive_old_emotional_states(states[:-_EMOTIONAL_STATES_MAX])
+            del states[:-_EMOTIONAL_STATES_MAX]
+        self._mark_dirty()
+
+    def _archive_old_emotional_states(self, evicted: List[Dict]):
+        """Append trimmed emotional states to a cold archive file"""
+        try:
+            archive_file = self.memory_file + ".emotions.archive.jsonl"
+            with open(archive_file, 'ab') as f:
+                for state in evicted:
+                    f.write(_json_dumps(state) + b"\n")
+        except Exception as e:
+            print(f"Emotional state archive failed: {str(e)}")
     
     def get_current_emotional_state(self) -> Optional[Dict]:
         """Get Bella's current emotional state and thoughts"""
-        if "emotional_states" not in self.memory_data or not self.memory_data["emotional_states"]:
-            return None
-            
-        return self.memory_data["emotional_states"][-1]
+        states = self.memory_data["emotional_states"]
+        return states[-1] if states else None
     
     def get_unfiltered_response(self, context: str) -> Optional[str]:
         """Generate an unfiltered response based on emotional state"""
@@ -1023,12 +1295,11 @@ class MemoryManager:
             
         return None
 
-    def add_memorable_phrase(self, phrase: str, context: str, impact_level: int):
+    def add_memorable_phrase(self, phrase: str, context: str,
+                             impact_level: int, timestamp: str = None):
         """Store memorable phrases and their context"""
-        if "memorable_phrases" not in self.memory_data:
-            self.memory_data["memorable_phrases"] = []
-            
-        timestamp = datetime.now().isoformat()
+        if timestamp is None:
+            timestamp = datetime.now().isoformat()
         self.memory_data["memorable_phrases"].append({
             "timestamp": timestamp,
             "phrase": phrase,
@@ -1037,33 +1308,49 @@ class MemoryManager:
             "usage_count": 0,
             "last_used": None
         })
-        self._save_memory()
-    
+        phrases = self.memory_data["memorable_phrases"]
+        if len(phrases) > _MEMORABLE_PHRASES_MAX:
+            del phrases[:-_MEMORABLE_PHRASES_MAX]
+            # Trimming shifts list positions, so the index must be rebuilt
+            self._phrase_index = self._build_phrase_index()
+        else:
+            idx = len(phrases) - 1
+            for word in context.lower().split():
+                self._phrase_index[word].add(idx)
+        self._mark_dirty()
+
+    def _build_phrase_index(self) -> Dict[str, Set[int]]:
+        """Build the context-word -> phrase-position inverted index"""
+        index = defaultdict(set)
+        for i, phrase in enumerate(self.memory_data.get("memorable_phrases",
+                                                        [])):
+            for word in phrase["context"].lower().split():
+                index[word].add(i)
+        return index
+
     def get_relevant_phrase(self, context: str) -> Optional[str]:
         """Get a relevant stored phrase based on context"""
-        if "memorable_phrases" not in self.memory_data:
+        phrases = self.memory_data.get("memorable_phrases")
+        if not phrases:
             return None
-            
-        phrases = self.memory_data["memorable_phrases"]
-        relevant_phrases = [
-            p for p in phrases 
-            if any(word in context.lower() for word in p["context"].lower().split())
-        ]
-        
-        if relevant_phrases:
-            chosen = max(relevant_phrases, key=lambda x: x["impact_level"])
+
+        # Union the postings for each context word instead of scanning and
+        # re-splitting every stored phrase
+        hits = set()
+        for word in context.lower().split():
+            hits |= self._phrase_index.get(word, set())
+
+        if hits:
+            chosen = phrases[max(hits, key=lambda i: phrases[i]["impact_level"])]
             chosen["usage_count"] += 1
             chosen["last_used"] = datetime.now().isoformat()
-            self._save_memory()
+            self._mark_dirty()
             return chosen["phrase"]
-            
+
         return None
 
     def add_message_pattern(self, user_id: str, pattern_type: str, content: str):
         """Track recurring message patterns from users"""
-        if "message_patterns" not in self.memory_data:
-            self.memory_data["message_patterns"] = {}
-            
         if user_id not in self.memory_data["message_patterns"]:
             self.memory_data["message_patterns"][user_id] = {
                 "greeting_patterns": [],
@@ -1082,10 +1369,21 @@ class MemoryManager:
                 patterns["common_phrases"][content] = 1
         else:
             pattern_list = patterns.get(f"{pattern_type}_patterns")
-            if pattern_list is not None and content not in pattern_list:
+            if pattern_list is not None and self._first_seen(
+                    (user_id, pattern_type), pattern_list, content):
                 pattern_list.append(content)
-                
-        self._save_memory()
+
+        self._mark_dirty()
+
+    def _first_seen(self, key, stored_list: List, value: str) -> bool:
+        """O(1) dedupe check against a stored list via a shadow set"""
+        seen = self._seen_values[key]
+        if not seen and stored_list:
+            seen.update(stored_list)
+        if value in seen:
+            return False
+        seen.add(value)
+        return True
 
     def analyze_conversation_style(self, user_id: str) -> Dict:
         """Analyze user's conversation style based on patterns"""
@@ -1108,50 +1406,89 @@ class MemoryManager:
         
         return style_analysis
 
+    def _analyze_message(self, message: str) -> Dict:
+        """Run all per-message analyzers over one lowercased copy
+
+        Type, sentiment, topics and keywords each used to lowercase and
+        scan the message independently; fusing them shares the lowered
+        string and the split word list.
+        """
+        message_lower = message.lower()
+
+        # Message type: first matching category wins, same order as the
+        # standalone classifier
+        if any(cmd in message_lower for cmd in _COMMAND_WORDS):
+            message_type = "command"
+        elif "?" in message:
+            message_type = "question"
+        elif any(word in message_lower for word in _GREETING_WORDS):
+            message_type = "greeting"
+        elif any(word in message_lower for word in _FAREWELL_WORDS):
+            message_type = "farewell"
+        elif any(word in message_lower for word in _GRATITUDE_WORDS):
+            message_type = "gratitude"
+        else:
+            message_type = "conversation"
+
+        keywords = list({
+            word for word in message_lower.split()
+            if len(word) > 3 and word not in _KEYWORD_STOPWORDS
+        })
+
+        return {
+            "message_type": message_type,
+            "sentiment": self._analyze_sentiment(message),
+            "topics": self._identify_topics(message),
+            "keywords": keywords
+        }
+
     def _determine_message_type(self, message: str) -> str:
         """Determine the type of message"""
         message_lower = message.lower()
         
-        if any(cmd in message_lower for cmd in ["ban", "kick", "timeout", "behave"]):
+        if any(cmd in message_lower for cmd in _COMMAND_WORDS):
             return "command"
         elif "?" in message:
             return "question"
-        elif any(word in message_lower for word in ["hi", "hello", "hey"]):
+        elif any(word in message_lower for word in _GREETING_WORDS):
             return "greeting"
-        elif any(word in message_lower for word in ["bye", "goodbye", "cya"]):
+        elif any(word in message_lower for word in _FAREWELL_WORDS):
             return "farewell"
-        elif any(word in message_lower for word in ["thanks", "thank you", "thx"]):
+        elif any(word in message_lower for word in _GRATITUDE_WORDS):
             return "gratitude"
         return "conversation"
 
     def _analyze_sentiment(self, message: str) -> str:
-        """Analyze the sentiment of a message"""
+        """Analyze the sentiment of a message (memoized on the raw text)"""
+        cached = self._sentiment_cache.get(message)
+        if cached is None:
+            cached = self._score_sentiment(message)
+            if len(self._sentiment_cache) >= self._analysis_cache_size:
+                self._sentiment_cache.clear()
+            self._sentiment_cache[message] = cached
+        return cached
+
+    @staticmethod
+    def _score_sentiment(message: str) -> str:
+        """Classify the sentiment of a message"""
         message_lower = message.lower()
-        
+
         # Very positive indicators
-        if any(phrase in message_lower for phrase in [
-            "love you", "amazing", "wonderful", "excellent", "perfect"
-        ]):
+        if any(phrase in message_lower for phrase in _VERY_POSITIVE_PHRASES):
             return "very_positive"
-            
+
         # Positive indicators
-        if any(word in message_lower for word in [
-            "good", "nice", "thanks", "please", "kind", "happy", "great"
-        ]):
+        if any(word in message_lower for word in _POSITIVE_HINTS):
             return "positive"
-            
+
         # Very negative indicators
-        if any(phrase in message_lower for phrase in [
-            "hate you", "stupid", "idiot", "shut up", "fuck"
-        ]):
+        if any(phrase in message_lower for phrase in _VERY_NEGATIVE_PHRASES):
             return "very_negative"
-            
+
         # Negative indicators
-        if any(word in message_lower for word in [
-            "bad", "mean", "rude", "angry", "sad", "hate", "dislike"
-        ]):
+        if any(word in message_lower for word in _NEGATIVE_HINTS):
             return "negative"
-            
+
         return "neutral"
 
     def _get_user_state(self, user_id: str) -> Dict:
@@ -1163,8 +1500,17 @@ class MemoryManager:
         }
 
     def _get_conversation_chain(self, user_id: str) -> List[Dict]:
-        """Get the recent conversation chain"""
-        return self.get_recent_conversations(user_id, limit=3)
+        """Get the recent conversation chain for embedding in a context
+
+        Only the text fields are kept: embedding full entries would pull
+        in their contexts, whose chains embed earlier entries in turn,
+        and each stored conversation would grow exponentially.
+        """
+        return [{
+            "timestamp": convo["timestamp"],
+            "message": convo["message"],
+            "response": convo["response"]
+        } for convo in self.get_recent_conversations(user_id, limit=3)]
 
     def _get_active_rules(self, user_id: str) -> Dict:
         """Get all active rules for a user"""
@@ -1236,38 +1582,17 @@ class MemoryManager:
 
     def _extract_keywords(self, message: str) -> List[str]:
         """Extract important keywords from message"""
-        # Simple keyword extraction based on common patterns
-        keywords = []
-        words = message.lower().split()
-        
-        # Extract potential keywords (nouns, verbs, etc.)
-        for word in words:
-            if len(word) > 3 and word not in ["this", "that", "have", "what", "when", "where"]:
-                keywords.append(word)
-        
-        return list(set(keywords))
+        # Simple keyword extraction based on common patterns; dedupe in
+        # one set comprehension instead of list -> set -> list
+        return list({word for word in message.lower().split()
+                     if len(word) > 3 and word not in _KEYWORD_STOPWORDS})
 
     def _identify_topics(self, message: str) -> List[str]:
         """Identify conversation topics"""
-        topics = []
-        message_lower = message.lower()
-        
-        # Define topic categories
-        topic_keywords = {
-            "greeting": ["hi", "hello", "hey"],
-            "farewell": ["bye", "goodbye", "cya"],
-            "command": ["ban", "kick", "timeout", "behave"],
-            "emotion": ["happy", "sad", "angry", "love", "hate"],
-            "question": ["what", "why", "how", "when", "where"],
-            "instruction": ["make", "do", "can you", "please", "help"],
-            "feedback": ["good", "bad", "nice", "terrible"]
-        }
-        
-        for topic, keywords in topic_keywords.items():
-            if any(word in message_lower for word in keywords):
-                topics.append(topic)
-                
-        return topics
+        return [
+            topic for topic, pattern in _CONVERSATION_TOPIC_PATTERNS.items()
+            if pattern.search(message)
+        ]
 
     def _find_references(self, message: str) -> Dict:
         """Find references to previous conversations or instructions"""
@@ -1279,18 +1604,17 @@ class MemoryManager:
         }
         
         # Look for user mentions
-        mention_pattern = r'<@!?(\d+)>'
-        references["users"] = re.findall(mention_pattern, message)
-        
+        references["users"] = _MENTION_RE.findall(message)
+
         # Look for command references
-        command_pattern = r'!(\w+)'
-        references["commands"] = re.findall(command_pattern, message)
-        
+        references["commands"] = _COMMAND_RE.findall(message)
+
         # Look for instruction references
+        message_lower = message.lower()
         if "instructions" in self.memory_data:
             for instruction in self.memory_data["instructions"].values():
                 for inst in instruction:
-                    if inst["instruction"].lower() in message.lower():
+                    if inst["instruction"].lower() in message_lower:
                         references["instructions"].append(inst)
         
         return references
@@ -1307,28 +1631,64 @@ class MemoryManager:
             "recent_emotions": self._get_recent_emotions(5)  # Get last 5 emotions
         }
 
-    def _find_related_memories(self, message: str, user_id: str) -> List[Dict]:
+    def _build_convo_index(self) -> Dict[str, Dict[str, Set[str]]]:
+        """Build the per-user keyword -> conversation-timestamp index"""
+        index = defaultdict(lambda: defaultdict(set))
+        for user_id, convos in self.memory_data.get("conversations",
+                                                    {}).items():
+            for timestamp, convo in convos.items():
+                self._index_conversation(user_id, timestamp,
+                                         self._stored_keywords(convo), index)
+        return index
+
+    def _stored_keywords(self, convo: Dict) -> List[str]:
+        """Keywords persisted with a conversation, re-extracting only for
+        records written before keywords were stored in the context"""
+        keywords = convo.get("context", {}).get("keywords")
+        if keywords is None:
+            keywords = self._extract_keywords(convo["message"])
+        return keywords
+
+    def _index_conversation(self, user_id: str, timestamp: str,
+                            keywords: List[str], index: Dict = None):
+        """Add one stored conversation's keywords to the inverted index"""
+        postings = (index if index is not None
+                    else self._convo_index)[user_id]
+        for keyword in keywords:
+            postings[keyword].add(timestamp)
+
+    def _find_related_memories(self, message: str, user_id: str,
+                               keywords: List[str] = None) -> List[Dict]:
         """Find memories related to current conversation"""
         related = []
-        keywords = self._extract_keywords(message)
-        
-        # Search through past conversations
-        if user_id in self.memory_data.get("conversations", {}):
-            for timestamp, convo in self.memory_data["conversations"][user_id].items():
-                convo_keywords = self._extract_keywords(convo["message"])
-                if any(keyword in convo_keywords for keyword in keywords):
+        if keywords is None:
+            keywords = self._extract_keywords(message)
+
+        # Union the index postings instead of re-extracting keywords from
+        # every past conversation on every incoming message
+        user_convos = self.memory_data.get("conversations", {}).get(user_id)
+        if user_convos:
+            postings = self._convo_index.get(user_id, {})
+            hits = set()
+            for keyword in keywords:
+                hits |= postings.get(keyword, set())
+            for timestamp in heapq.nlargest(5, hits):
+                convo = user_convos.get(timestamp)
+                if convo is not None:  # Skip postings pruned from the store
                     related.append({
                         "type": "conversation",
                         "timestamp": timestamp,
                         "content": convo["message"]
                     })
-        
-        return related[:5]  # Return top 5 related memories
 
-    def _find_relevant_instructions(self, message: str) -> List[Dict]:
+        return related  # Top 5 related memories, newest first
+
+    def _find_relevant_instructions(self, message: str,
+                                    keywords: List[str] = None) -> List[Dict]:
         """Find instructions relevant to the current message"""
         relevant = []
-        keywords = self._extract_keywords(message)
+        if keywords is None:
+            keywords = self._extract_keywords(message)
         
         # Search through all instructions
         if "instructions" in self.memory_data:
@@ -1355,14 +1715,9 @@ class MemoryManager:
 
     def _get_recent_emotions(self, limit: int = 5) -> List[Dict]:
         """Get recent emotional states"""
-        if "emotional_states" not in self.memory_data:
-            return []
-            
-        recent = sorted(
-            self.memory_data["emotional_states"],
-            key=lambda x: x["timestamp"],
-            reverse=True
-        )[:limit]
+        # emotional_states is append-only with monotonic timestamps; the
+        # newest entries are simply the tail, no sort needed
+        recent = self.memory_data["emotional_states"][-limit:][::-1]
         
         return [{
             "emotion": state["emotion"],
@@ -1375,9 +1730,9 @@ class MemoryManager:
         message_lower = message.lower()
         
         # Process greeting patterns
-        if any(word in message_lower for word in ["hi", "hello", "hey"]):
+        if any(word in message_lower for word in _GREETING_WORDS):
             self.add_message_pattern(user_id, "greeting_patterns", message)
-        elif any(word in message_lower for word in ["bye", "goodbye", "cya"]):
+        elif any(word in message_lower for word in _FAREWELL_WORDS):
             self.add_message_pattern(user_id, "farewell_patterns", message)
         elif "?" in message:
             self.add_message_pattern(user_id, "question_patterns", message)
@@ -1387,7 +1742,8 @@ class MemoryManager:
             self.add_memorable_phrase(
                 message,
                 context["message_type"],
-                8 if context["sentiment"] == "very_positive" else 9
+                8 if context["sentiment"] == "very_positive" else 9,
+                timestamp=context["timestamp"]
             )
             
         # Track common phrases (3+ words)
@@ -1401,9 +1757,6 @@ class MemoryManager:
 
     def add_user_preference(self, user_id: str, preference_type: str, value: str):
         """Track user preferences and likes/dislikes"""
-        if "user_preferences" not in self.memory_data:
-            self.memory_data["user_preferences"] = {}
-            
         if user_id not in self.memory_data["user_preferences"]:
             self.memory_data["user_preferences"][user_id] = {
                 "topics": [],
@@ -1417,18 +1770,16 @@ class MemoryManager:
         
         if preference_type in preferences:
             if isinstance(preferences[preference_type], list):
-                if value not in preferences[preference_type]:
+                if self._first_seen((user_id, preference_type),
+                                    preferences[preference_type], value):
                     preferences[preference_type].append(value)
             else:
                 preferences[preference_type] = value
                 
-        self._save_memory()
+        self._mark_dirty()
 
     def update_interaction_metrics(self, user_id: str):
         """Update user interaction metrics"""
-        if "interaction_metrics" not in self.memory_data:
-            self.memory_data["interaction_metrics"] = {}
-            
         if user_id not in self.memory_data["interaction_metrics"]:
             self.memory_data["interaction_metrics"][user_id] = {
                 "last_interaction": None,
@@ -1441,8 +1792,8 @@ class MemoryManager:
         
         if metrics["last_interaction"]:
             # Calculate time since last interaction
-            last_time = datetime.fromisoformat(metrics["last_interaction"])
-            current = datetime.fromisoformat(current_time)
+            last_time = _parse_iso(metrics["last_interaction"])
+            current = _parse_iso(current_time)
             time_diff = (current - last_time).total_seconds()
             
             # Update average response time
@@ -1454,30 +1805,28 @@ class MemoryManager:
         metrics["last_interaction"] = current_time
         metrics["interaction_count"] += 1
         
-        self._save_memory()
+        self._mark_dirty()
 
     def update_relationship_status(self, user_id: str, status: str):
         """Update relationship status with a user"""
-        if "relationships" not in self.memory_data:
-            self.memory_data["relationships"] = {}
-            
+        timestamp = datetime.now().isoformat()
         self.memory_data["relationships"][user_id] = {
             "status": status,
-            "last_updated": datetime.now().isoformat(),
+            "last_updated": timestamp,
             "history": self.memory_data["relationships"].get(user_id, {}).get("history", [])
         }
-        
+
         # Add to history
         history_entry = {
             "status": status,
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": timestamp,
             "context": self._get_current_context()
         }
         
         self.memory_data["relationships"][user_id]["history"] = \
             self.memory_data["relationships"][user_id].get("history", [])[-4:] + [history_entry]
         
-        self._save_memory()
+        self._mark_dirty()
 
     def _get_current_context(self) -> Dict:
         """Get current context for relationship updates"""
@@ -1489,16 +1838,12 @@ class MemoryManager:
 
     def _get_current_emotional_state(self) -> Dict:
         """Get current emotional state"""
-        if not self.memory_data.get("emotional_states"):
+        states = self.memory_data.get("emotional_states")
+        if not states:
             return {"emotion": "neutral", "intensity": 0}
-            
-        current_states = sorted(
-            self.memory_data["emotional_states"],
-            key=lambda x: x["timestamp"],
-            reverse=True
-        )
-        
-        return current_states[0] if current_states else {"emotion": "neutral", "intensity": 0}
+
+        # Appended in time order, so the newest state is simply the tail
+        return states[-1]
 
     def _get_recent_interactions_summary(self) -> Dict:
         """Get summary of recent interactions"""
@@ -1509,29 +1854,30 @@ class MemoryManager:
             "total": 0
         }
         
+        # ISO timestamps compare lexicographically and conversations are
+        # inserted in time order, so walk each user's dict from the newest
+        # end and stop at the cutoff - no parsing, and old history is
+        # never touched
+        cutoff_iso = (datetime.now() - timedelta(hours=24)).isoformat()
         for user_id, interactions in self.memory_data.get("conversations", {}).items():
-            for timestamp, interaction in interactions.items():
-                if datetime.now() - datetime.fromisoformat(timestamp) <= timedelta(hours=24):
-                    sentiment = interaction.get("context", {}).get("sentiment", "neutral")
-                    if "positive" in sentiment:
-                        recent_interactions["positive"] += 1
-                    elif "negative" in sentiment:
-                        recent_interactions["negative"] += 1
-                    else:
-                        recent_interactions["neutral"] += 1
-                    recent_interactions["total"] += 1
-                    
+            for timestamp in reversed(interactions):
+                if timestamp < cutoff_iso:
+                    break
+                interaction = interactions[timestamp]
+                sentiment = interaction.get("context", {}).get("sentiment", "neutral")
+                bucket = _SENTIMENT_BUCKET.get(sentiment, "neutral")
+                recent_interactions[bucket] += 1
+                recent_interactions["total"] += 1
+
         return recent_interactions
 
     def get_relationship_status(self, user_id: str) -> Dict:
         """Get the relationship status with a user"""
-        if "relationships" not in self.memory_data:
-            self.memory_data["relationships"] = {}
-            
-        if user_id not in self.memory_data["relationships"]:
+        relationship = self.memory_data["relationships"].get(user_id)
+        if relationship is None:
             return {"status": "neutral", "last_updated": datetime.now().isoformat()}
-            
-        return self.memory_data["relationships"][user_id]
+
+        return relationship
 
     def get_user_name(self, user_id: str) -> str:
         """Get user's name or default to 'User'"""
@@ -1544,17 +1890,19 @@ class MemoryManager:
             return []
             
         conversations = self.memory_data["conversations"][user_id]
-        sorted_convos = sorted(conversations.items(), key=lambda x: x[1]["timestamp"], reverse=True)
-        
+
+        # Entries insert in time order with their timestamp as the key, so
+        # the newest ones are the dict's tail - no sort over all history
         chain = []
-        for _, convo in sorted_convos[:limit]:
+        for timestamp in islice(reversed(conversations), limit):
+            convo = conversations[timestamp]
             chain.append({
                 "message": convo["message"],
                 "response": convo["response"],
                 "context": convo.get("context", {}),
-                "timestamp": convo["timestamp"]
+                "timestamp": timestamp
             })
-            
+
         return chain
 
     def get_active_instructions(self, user_id: str) -> List[Dict]:
@@ -1562,30 +1910,35 @@ class MemoryManager:
         if user_id not in self.memory_data.get("instructions", {}):
             return []
             
-        active_instructions = []
-        for instruction in self.memory_data["instructions"][user_id]:
+        # ISO strings compare lexicographically, so expiry checks need no
+        # parsing and datetime.now() is formatted once for the whole loop
+        now_iso = datetime.now().isoformat()
+        return [
+            instruction
+            for instruction in self.memory_data["instructions"][user_id]
             if instruction["is_permanent"] or (
-                instruction.get("expiry") and 
-                datetime.fromisoformat(instruction["expiry"]) > datetime.now()
-            ):
-                active_instructions.append(instruction)
-                
-        return active_instructions
+                instruction.get("expiry") and
+                instruction["expiry"] > now_iso
+            )
+        ]
 
     def _get_conversation_context(self, user_id: str) -> Dict:
         """Get context from recent conversations"""
         recent_convos = self.get_conversation_chain(user_id, limit=3)
-        topics = set()
+        topic_lists = []
         sentiment = "neutral"
-        
+
         for convo in recent_convos:
             if "context" in convo:
-                topics.update(convo["context"].get("topics", []))
+                topic_lists.append(convo["context"].get("topics", []))
                 # Update sentiment based on most recent significant emotion
                 if convo["context"].get("sentiment") in ["very_positive", "very_negative"]:
                     sentiment = convo["context"]["sentiment"]
                     break
-                    
+
+        # Single C-level union instead of per-topic hash inserts
+        topics = set().union(*topic_lists)
+
         return {
             "recent_topics": list(topics),
             "overall_sentiment": sentiment,
@@ -1594,47 +1947,34 @@ class MemoryManager:
 
     def add_media_interaction(self, user_id: str, media_type: str, context: Dict):
         """Track media interactions"""
-        if "media_interactions" not in self.memory_data:
-            self.memory_data["media_interactions"] = {
-                "images": {},
-                "voice_messages": {},
-                "last_processed": None
-            }
-            
-        if user_id not in self.memory_data["media_interactions"][media_type]:
-            self.memory_data["media_interactions"][media_type][user_id] = []
-            
+        timestamp = datetime.now().isoformat()
         interaction_data = {
-            "timestamp": datetime.now().isoformat(),
+            "timestamp": timestamp,
             "context": context
         }
+
+        media = self.memory_data["media_interactions"]
+        media[media_type].setdefault(user_id, []).append(interaction_data)
+        media["last_processed"] = timestamp
         
-        self.memory_data["media_interactions"][media_type][user_id].append(interaction_data)
-        self.memory_data["media_interactions"]["last_processed"] = datetime.now().isoformat()
-        
-        self._save_memory()
+        self._mark_dirty()
 
     def add_owner_note_about_user(self, target_user_id: str, note: str, context: str = None):
         """Store owner's comments/notes about specific users"""
-        if "user_notes" not in self.memory_data:
-            self.memory_data["user_notes"] = {}
-            
-        if target_user_id not in self.memory_data["user_notes"]:
-            self.memory_data["user_notes"][target_user_id] = []
-            
         note_entry = {
             "timestamp": datetime.now().isoformat(),
             "note": note,
             "context": context,
             "active": True
         }
-        
-        self.memory_data["user_notes"][target_user_id].append(note_entry)
-        self._save_memory()
+
+        self.memory_data["user_notes"].setdefault(target_user_id,
+                                                  []).append(note_entry)
+        self._mark_dirty()
         
     def get_owner_notes_about_user(self, user_id: str) -> List[Dict]:
         """Get all active notes about a user"""
-        if "user_notes" not in self.memory_data or user_id not in self.memory_data["user_notes"]:
+        if user_id not in self.memory_data["user_notes"]:
             return []
             
         return [note for note in self.memory_data["user_notes"][user_id] if note["active"]]
@@ -1645,8 +1985,28 @@ class MemoryManager:
         if not notes:
             return ""
             
-        recent_notes = sorted(notes, key=lambda x: x["timestamp"], reverse=True)[:3]
-        return "\n".join([f"Owner said: {note['note']}" for note in recent_notes])
+        recent_notes = heapq.nlargest(3, notes, key=lambda x: x["timestamp"])
+        return "\n".join(f"Owner said: {note['note']}" for note in recent_notes)
+
+    def get_message_context(self, user_id: str) -> Dict:
+        """Gather everything on_message needs about a user in one call
+
+        Pure consolidation, no caching: on_message records the message's
+        own metrics before asking for context, so any cached copy would
+        already be invalid by the time it could be reused.
+        """
+        return {
+            "user_info": self.get_user_info(user_id),
+            "user_name": self.get_user_name(user_id),
+            "relationship": self.get_relationship_status(user_id),
+            "behavior_type": self.get_user_behavior_type(user_id),
+            "conversation_summary": self.get_conversation_summary(user_id),
+            "active_commands": self.get_active_owner_commands(),
+            "punishment_rules": self.get_active_punishments_summary(),
+            "behavior_rules": self.get_user_behavior_rules(user_id),
+            "user_context": self.get_user_context_summary(user_id),
+            "analytics": self.get_user_analytics(user_id),
+        }
 
     def get_user_analytics(self, user_id: str) -> Dict:
         """Get analytics for specific user"""
@@ -1654,9 +2014,14 @@ class MemoryManager:
             return None
             
         analytics = self.memory_data["analytics"]["user_engagement"][user_id]
+        total = analytics.get("total_messages", 0)
+        if "total_message_length" in analytics:
+            avg_length = analytics["total_message_length"] / total if total else 0
+        else:
+            avg_length = analytics.get("avg_message_length", 0)
         return {
-            "total_messages": analytics.get("total_messages", 0),
-            "avg_length": round(analytics.get("avg_message_length", 0), 2),
+            "total_messages": total,
+            "avg_length": round(avg_length, 2),
             "sentiment": analytics.get("sentiment_distribution", {}),
             "active_hours": analytics.get("active_hours", {})
         }